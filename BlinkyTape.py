@@ -22,6 +22,10 @@ BlinkyTape Python communication library.
 """
 import serial
 import datetime
+import time
+import threading
+import numpy as np
+from clock import SystemClock
 # For Python3 support- always run strings through a bytes converter
 import sys
 if sys.version_info < (3,):
@@ -33,9 +37,16 @@ else:
     def encode(x):
         return codecs.latin_1_encode(x)[0]
 
+# Translation table clamping pixel bytes to 0-254, 255 is the show command
+CLAMP = encode("".join(chr(min(i, 254)) for i in range(256)))
+
 
 class BlinkyTape(object):
-    def __init__(self, port, ledCount=60, buffered=True):
+    def __init__(self, port, ledCount=60, buffered=True, reconnect=False,
+                 finder=None, reconnect_interval=0.5, lazy=False, blank=True,
+                 last_state=None, coalesce_bytes=48, coalesce_window=0.002,
+                 skip_duplicates=False, clock=None, baudrate=115200,
+                 hours=(16, 23)):
         """Creates a BlinkyTape object and opens the port.
 
         Parameters:
@@ -51,28 +62,231 @@ class BlinkyTape(object):
           buffered
             Optional, enabled by default. If enabled, will buffer
             pixel data until a show command is issued. If disabled,
-            the data will be sent in byte triplets as expected by firmware,
-            with immediate flush of the serial buffers (slower).
+            pixel data is streamed to the firmware as it is set, with
+            pixels set in quick succession coalesced into one write
+            (see coalesce_bytes and coalesce_window).
+          reconnect
+            Optional, disabled by default. If enabled, serial errors are
+            caught, the port is reopened once the device reappears and
+            the frame that was being sent is streamed again.
+          finder
+            Optional, callable returning the port to reconnect to (or
+            None while nothing is attached). Defaults to the original
+            port, which handles replugs that keep the same name.
+          reconnect_interval
+            Optional, seconds to wait between reconnect attempts.
+          lazy
+            Optional, disabled by default. If enabled, the port is not
+            opened until the first pixel data is written.
+          blank
+            Optional, enabled by default. Shows an all-off frame once the
+            port is opened. Ignored in lazy mode, where the first frame
+            written replaces whatever the strip shows.
+          last_state
+            Optional, pixel data (see send_frame) to show right after
+            opening instead of the blank frame, ex: the last_frame of a
+            previous BlinkyTape object. In lazy mode it is not sent but
+            taken as what the strip already shows, for refresh() and
+            skip_duplicates.
+          coalesce_bytes
+            Optional, unbuffered mode only. Pending pixel data is written
+            once it reaches this many bytes. 3 writes every pixel.
+          coalesce_window
+            Optional, unbuffered mode only. A pixel is written right away
+            if no pixel data was written in the last this many seconds.
+            Pixels following a write within it are held until the first
+            pixel after it, coalesce_bytes or show().
+          skip_duplicates
+            Optional, disabled by default. If enabled, send_frame does not
+            write a frame identical to the one already shown.
+          clock
+            Optional, clock used for sleep() and the on hours, defaults
+            to the system clock. See clock.VirtualClock for simulation.
+          baudrate
+            Optional, serial speed, defaults to 115200. The stock
+            firmware talks over USB CDC and ignores it.
+          hours
+            Optional, (start, end) hours of the day the lights are on,
+            start inclusive and end exclusive, defaults to 16:00-23:00.
+            An end before the start wraps past midnight.
 
         """
         self.port = port
+        self.baudrate = baudrate
+        self.hours = hours
+        self.clock = clock or SystemClock()
         self.ledCount = ledCount
         self.position = 0
         self.buffered = buffered
         self.buf = ""
-        self.serial = serial.Serial(port, 115200)
-        self.show()  # Flush any incomplete data
+        self.sent = b""  # data of the current frame already on the wire
+        self.pending = ""  # unbuffered pixel data waiting to be coalesced
+        self.last_write = 0  # time pixel data was last streamed
+        self.coalesce_bytes = coalesce_bytes
+        self.coalesce_window = coalesce_window
+        self.reconnect = reconnect
+        self.finder = finder
+        self.reconnect_interval = reconnect_interval
+        self.reconnects = 0
+        self.skip_duplicates = skip_duplicates
+        # frames shown, duplicate frames skipped, frames dropped by effects
+        # running late, bytes and errors on the port
+        self.stats = {'frames': 0, 'skipped': 0, 'dropped': 0, 'bytes': 0,
+                      'serial_errors': 0}
+        self.last_frame = b""  # pixel data of the last frame shown
+        self.source = None  # that frame as passed in, for refresh()
+        self.brightness = 255
+        self.lut = CLAMP
+        self.frame_hooks = []  # called with this object after every frame
+        self.stages = []  # functions applied to frames passed to send_frame
+        self.wake = threading.Event()
         self.override = False
-        self.timeoutval = datetime.datetime.now()
-        self.displayColor(0, 0, 0)
+        self.timeoutval = self.clock.now()
+        self.serial = None
+        if lazy:
+            if last_state is not None:
+                data = last_state.tobytes() if hasattr(last_state, 'tobytes') \
+                    else bytes(last_state)
+                self.source = data
+                self.last_frame = data.translate(CLAMP)
+        else:
+            self._open()
+            if last_state is not None:
+                self.send_frame(last_state)
+            elif blank:
+                self.send_frame(bytes(bytearray(3 * ledCount)))
+
+    def _open(self):
+        """Opens the port and flushes any incomplete data."""
+        self.serial = serial.Serial(self.port, self.baudrate)
+        self.serial.write(encode(chr(255)))
+        self.serial.flush()
 
     def get_led_count(self):
         return self.ledCount
 
+    def set_brightness(self, value):
+        """Scales all pixel data sent from now on by [value] / 255.
+
+        send_frame scales in float ahead of the stages, so a dither stage
+        keeps the fractions. Pixels set one at a time go through a lookup
+        table instead.
+        """
+        self.brightness = max(0, min(int(value), 255))
+        self.lut = encode("".join(chr(min(i * self.brightness // 255, 254))
+                                  for i in range(256)))
+
+    def sleep(self, seconds):
+        """Waits between frames.
+
+        Setting [wake] runs the frame hooks right away instead of after
+        the next frame, so commands from other threads are not held up by
+        long pauses. Exceptions raised by hooks end the wait.
+        """
+        deadline = self.clock.time() + seconds
+        while True:
+            remaining = deadline - self.clock.time()
+            if remaining <= 0:
+                return
+            if self.clock.wait(self.wake, remaining):
+                self.wake.clear()
+                self._frame_done()
+
+    def _frame_done(self):
+        """Runs the frame hooks at a frame boundary."""
+        for hook in list(self.frame_hooks):
+            hook(self)
+
     def set_override(self, val, timeout=30):
         self.override = val
         if val:
-            self.timeoutval = datetime.datetime.now() + datetime.timedelta(minutes=timeout)
+            self.timeoutval = self.clock.now() + datetime.timedelta(minutes=timeout)
+
+    def active(self):
+        """Returns True inside the on hours or while overridden."""
+        now = self.clock.now()
+        if self.timeoutval < now:
+            self.set_override(False)
+        start, end = self.hours
+        if start <= end:
+            on = start <= now.hour < end
+        else:
+            on = now.hour >= start or now.hour < end
+        return on or self.override
+
+    def send_frame(self, frame, show=True):
+        """Sends a whole frame of pixel data and shows it.
+
+        [frame] is a bytes-like object, or anything with a tobytes()
+        method such as a NumPy array, holding up to [ledCount] RGB
+        triplets. It is scaled by the brightness, then passed through each
+        function in [stages]; float arrays left after that are rounded. Values are clamped to
+        0-254. Outside the on hours an all-off frame is sent instead.
+
+        If [show] is False the data is written without the show command,
+        which a later call to show() sends.
+
+        Returns 1 if the frame was shown, -1 if the lights are off.
+        """
+        if show:
+            # effects reuse their frame buffers, so keep a copy
+            self.source = bytes(frame) if isinstance(frame, bytearray) \
+                else frame.copy() if hasattr(frame, 'copy') else frame
+        if self.brightness < 255:
+            if isinstance(frame, (bytes, bytearray, memoryview)):
+                frame = np.frombuffer(frame, dtype=np.uint8)
+            # stages expect (n, 3) frames, whatever shape came in
+            frame = np.multiply(np.reshape(frame, (-1, 3)),
+                                np.float32(self.brightness / 255.0),
+                                dtype=np.float32)
+        for stage in self.stages:
+            frame = stage(frame)
+        if getattr(frame, 'dtype', None) is not None and frame.dtype.kind == 'f':
+            frame = (frame + 0.5).clip(0, 255).astype('uint8')
+        if isinstance(frame, (bytes, bytearray)):
+            data = frame
+        elif hasattr(frame, 'tobytes'):
+            data = frame.tobytes()
+        else:
+            data = bytes(frame)
+        if len(data) > 3 * self.ledCount:
+            raise RuntimeError("Attempting to set pixel outside range!")
+        ret = 1
+        if not self.active():
+            data = bytes(bytearray(len(data)))
+            ret = -1
+        data = bytes(data.translate(CLAMP))
+        self.buf = ""
+        self.pending = ""
+        if show and self.skip_duplicates and not self.sent and \
+                data == self.last_frame:
+            self.stats['skipped'] += 1
+            self.position = 0
+            self._frame_done()
+            return ret
+        if not show:
+            self._write(data)
+            self.sent = data
+            self.position = len(data) // 3
+            return ret
+        self._write(data + encode(chr(255)))
+        self.sent = b""
+        self._flush_input()
+        self.last_frame = data
+        self.position = 0
+        self.stats['frames'] += 1
+        self._frame_done()
+        return ret
+
+    def refresh(self):
+        """Sends the last frame again, ex: after changing the brightness.
+
+        Does nothing before the first frame or while a frame is only
+        partly sent. Returns what send_frame returned, or None.
+        """
+        if self.source is None or self.sent or self.pending:
+            return None
+        return self.send_frame(self.source)
 
     def send_list(self, colors):
         if len(colors) > self.ledCount:
@@ -88,12 +302,12 @@ class BlinkyTape(object):
 
         data = data.replace(chr(255), chr(254))
 
-        self.serial.write(encode(data))
+        self._write(data)
         self.show()
 
     def sendData(self, data):
         data = data.replace(chr(255), chr(254))
-        self.serial.write(encode(data))
+        self._write(data)
         self.show()
 
     def sendPixel(self, r, g, b):
@@ -112,10 +326,7 @@ class BlinkyTape(object):
 
         Throws a RuntimeException if [ledCount] pixels are already set.
         """
-        if self.timeoutval < datetime.datetime.now():
-            self.set_override(False)
-
-        if not(datetime.datetime.now().hour < 23 and datetime.datetime.now().hour > 15 or self.override) and not r == 0 and not g == 0 and b == 0:
+        if not self.active() and not r == 0 and not g == 0 and b == 0:
             return
         data = ""
         data = chr(r) + chr(g) + chr(b)
@@ -125,8 +336,15 @@ class BlinkyTape(object):
             if self.buffered:
                 self.buf += data
             else:
-                self.serial.write(encode(data))
-                self.serial.flush()
+                self.pending += data
+                now = time.time()
+                if len(self.pending) >= self.coalesce_bytes or \
+                        now - self.last_write >= self.coalesce_window:
+                    data = encode(self.pending).translate(self.lut)
+                    self._write(data, self.sent, drain=False)
+                    self.sent += data
+                    self.pending = ""
+                    self.last_write = now
             self.position += 1
         else:
             raise RuntimeError("Attempting to set pixel outside range!")
@@ -137,41 +355,88 @@ class BlinkyTape(object):
         Resets the next pixel position to 0, flushes the serial buffer,
         and discards any accumulated responses from BlinkyTape.
         """
-        control = chr(255)
-        if self.buffered:
-            # Fix an OS X specific bug where sending more than 383 bytes of data at once
-            # hangs the BlinkyTape controller. Why this is???
-            # TODO: Test me on other platforms
-            CHUNK_SIZE = 300
-
-            self.buf += control
-            for i in range(0, len(self.buf), CHUNK_SIZE):
-                self.serial.write(encode(self.buf[i:i + CHUNK_SIZE]))
-                self.serial.flush()
-
-            self.buf = ""
-        else:
-            self.serial.write(encode(control))
-        self.serial.flush()
-        self.serial.flushInput()  # Clear responses from BlinkyTape, if any
+        control = encode(chr(255))
+        data = encode(self.buf + self.pending)
+        self.source = None if self.sent else data
+        data = data.translate(self.lut)
+        self._write(data + control, self.sent)
+        self.last_frame = self.sent + data
+        self.buf = ""
+        self.pending = ""
+        self.sent = b""
+        self.last_write = 0  # the next frame's first pixel goes right away
+        self._flush_input()
         self.position = 0
+        self.stats['frames'] += 1
+        self._frame_done()
+
+    def _flush_input(self):
+        """Discards any accumulated responses from BlinkyTape."""
+        try:
+            self.serial.flushInput()
+        except (serial.SerialException, OSError):
+            if not self.reconnect:
+                raise
+
+    def _write(self, data, replay=b"", drain=True):
+        """Writes data to the port, reconnecting on serial errors.
+
+        After a reconnect [replay], the part of the current frame that
+        was already sent, is written again ahead of [data] so the frame
+        is resumed from its first pixel. Unless [drain] is False the
+        output buffer is flushed after every chunk.
+        """
+        # Fix an OS X specific bug where sending more than 383 bytes of data at once
+        # hangs the BlinkyTape controller. Why this is???
+        # TODO: Test me on other platforms
+        CHUNK_SIZE = 300
+
+        if not isinstance(data, bytes):
+            data = encode(data)
+        while True:
+            try:
+                if self.serial is None:
+                    self._open()
+                for i in range(0, len(data), CHUNK_SIZE):
+                    self.serial.write(data[i:i + CHUNK_SIZE])
+                    if drain:
+                        self.serial.flush()
+                self.stats['bytes'] += len(data)
+                return
+            except (serial.SerialException, OSError):
+                self.stats['serial_errors'] += 1
+                if not self.reconnect:
+                    raise
+                self._reconnect()
+                data = replay + data
+                replay = b""
+
+    def _reconnect(self):
+        """Waits for the device to reappear and reopens the port."""
+        self.reconnects += 1
+        try:
+            if self.serial is not None:
+                self.serial.close()
+        except (serial.SerialException, OSError):
+            pass
+        while True:
+            port = self.finder() if self.finder else self.port
+            if port:
+                try:
+                    self.port = port
+                    self._open()
+                    return
+                except (serial.SerialException, OSError):
+                    pass
+            time.sleep(self.reconnect_interval)
 
     def displayColor(self, r, g, b):
-        """Fills [ledCount] pixels with RGB color and shows it."""
-        if self.timeoutval < datetime.datetime.now():
-            self.set_override(False)
-
-        if datetime.datetime.now().hour < 23 and datetime.datetime.now().hour > 15 or self.override:
-            for i in range(0, self.ledCount):
-                self.sendPixel(r, g, b)
-            self.show()
-            return 1
+        """Fills [ledCount] pixels with RGB color and shows it.
 
-        else:
-            for i in range(0, self.ledCount):
-                self.sendPixel(0, 0, 0)
-            self.show()
-            return -1
+        Returns 1 if the color was shown, -1 if the lights are off.
+        """
+        pixel = bytearray([min(r, 255), min(g, 255), min(b, 255)])
+        return self.send_frame(bytes(pixel * self.ledCount))
 
     def resetToBootloader(self):
         """Initiates a reset on BlinkyTape.
@@ -183,34 +448,35 @@ class BlinkyTape(object):
 
     def close(self):
         """Safely closes the serial port."""
-        self.serial.close()
+        if self.serial is not None:
+            self.serial.close()
 
 
 # Example code
 
 if __name__ == "__main__":
 
-    import glob
-    import optparse
-
-    parser = optparse.OptionParser()
-    parser.add_option("-p", "--port", dest="portname",
-                      help="serial port (ex: /dev/ttyUSB0)", default=None)
-    parser.add_option("-c", "--ledcount", dest="ledcount",
-                      help="number of LEDs attached", type="int", default=60)
-    parser.add_option("-b", action="store_true",
-                      default="True", dest="buffered")
-    parser.add_option("-u", action="store_false", dest="buffered")
-
-    (options, args) = parser.parse_args()
-
-    if options.portname is not None:
-        port = options.portname
-    else:
-        serialPorts = glob.glob("/dev/cu.usbmodem*")
-        port = serialPorts[0]
-
-    bt = BlinkyTape(port, options.ledcount, options.buffered)
+    import argparse
+    import devices
+    from power import PowerLimiter
+
+    parser = argparse.ArgumentParser(description="Cycles every LED through "
+                                     "red, green, blue, white and off.")
+    parser.add_argument("-p", "--port", help="serial port (ex: /dev/ttyACM0), "
+                        "defaults to the first BlinkyTape found")
+    parser.add_argument("-c", "--ledcount", type=int, default=60,
+                        help="number of LEDs attached")
+    parser.add_argument("-u", "--unbuffered", action="store_false",
+                        dest="buffered", help="stream pixels as they are set")
+    args = parser.parse_args()
+
+    port = args.port or devices.find_device()
+    if port is None:
+        parser.error("no BlinkyTape found, pass --port")
+
+    bt = BlinkyTape(port, args.ledcount, args.buffered)
+    # Full white on every LED draws more than a USB port supplies
+    bt.stages.append(PowerLimiter())
 
     while True:
         bt.displayColor(255, 0, 0)
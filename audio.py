@@ -0,0 +1,116 @@
+"""
+Streaming audio input and spectrum analysis for audio reactive effects.
+
+Audio is read in small blocks (one frame period by default) from a WAV
+file or a raw PCM stream such as stdin, so at most one block is buffered
+between the audio source and the lights.
+"""
+import wave
+import numpy as np
+
+DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+def _to_mono(data, channels, sample_width):
+    """[converts interleaved PCM bytes to mono float32 in -1..1]"""
+    samples = np.frombuffer(data, dtype=DTYPES[sample_width])
+    samples = samples[:len(samples) - len(samples) % channels]
+    samples = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    if sample_width == 1:
+        return (samples - 128) / 128
+    return samples / float(1 << (8 * sample_width - 1))
+
+
+def wav_blocks(path, block_size):
+    """[yields mono blocks of block_size samples from a WAV file]
+
+    Arguments:
+        path {[string]} -- [WAV file]
+        block_size {[int]} -- [samples per block]
+    """
+    reader = wave.open(path, 'rb')
+    try:
+        channels = reader.getnchannels()
+        width = reader.getsampwidth()
+        while True:
+            data = reader.readframes(block_size)
+            if len(data) < block_size * channels * width:
+                return
+            yield _to_mono(data, channels, width)
+    finally:
+        reader.close()
+
+
+def pcm_blocks(stream, block_size, channels=1, sample_width=2):
+    """[yields mono blocks from raw little endian PCM, ex: sys.stdin.buffer]
+
+    Arguments:
+        stream {[file]} -- [binary stream]
+        block_size {[int]} -- [samples per block]
+        channels {[int]} -- [interleaved channels]
+        sample_width {[int]} -- [bytes per sample]
+    """
+    data = bytearray(block_size * channels * sample_width)
+    view = memoryview(data)
+    while True:
+        filled = 0
+        while filled < len(data):
+            n = stream.readinto(view[filled:])
+            if not n:
+                return
+            filled += n
+        yield _to_mono(data, channels, sample_width)
+
+
+class SpectrumAnalyzer(object):
+    def __init__(self, bands, sample_rate, fft_size=1024, fmin=40.0,
+                 fmax=16000.0, smoothing=0.5, decay=0.9, floor_db=-60.0):
+        """[turns audio blocks into smoothed levels of log spaced bands]
+
+        Arguments:
+            bands {[int]} -- [number of bands, usually the LED count]
+            sample_rate {[int]} -- [samples per second]
+            fft_size {[int]} -- [samples in the analysis window]
+            fmin {[float]} -- [lowest band edge in Hz]
+            fmax {[float]} -- [highest band edge in Hz]
+            smoothing {[float]} -- [weight of the previous level, 0-1]
+            decay {[float]} -- [peak hold fall off per block, 0-1]
+            floor_db {[float]} -- [level shown as 0]
+        """
+        self.fft_size = fft_size
+        self.smoothing = smoothing
+        self.decay = decay
+        self.floor_db = floor_db
+        self.window = np.hanning(fft_size).astype(np.float32)
+        self.scale = 2.0 / self.window.sum()
+        self.samples = np.zeros(fft_size, dtype=np.float32)
+        fmax = min(fmax, sample_rate / 2.0)
+        edges = np.geomspace(fmin, fmax, bands + 1) * fft_size / sample_rate
+        self.low = np.clip(edges[:-1].astype(np.intp), 0, fft_size // 2)
+        self.high = np.maximum(edges[1:].astype(np.intp), self.low + 1)
+        self.high = np.minimum(self.high, fft_size // 2 + 1)
+        self.width = (self.high - self.low).astype(np.float32)
+        self.level = np.zeros(bands, dtype=np.float32)
+        self.peak = np.zeros(bands, dtype=np.float32)
+
+    def process(self, block):
+        """[adds a block of samples and updates the band levels]
+
+        Arguments:
+            block {[array]} -- [mono float samples, at most fft_size long]
+
+        Returns:
+            [array] -- [band levels in 0-1]
+        """
+        hop = len(block)
+        self.samples[:-hop] = self.samples[hop:]
+        self.samples[-hop:] = block
+        magnitude = np.abs(np.fft.rfft(self.samples * self.window)) * self.scale
+        total = np.concatenate(([0.0], np.cumsum(magnitude)))
+        power = (total[self.high] - total[self.low]) / self.width
+        db = 20 * np.log10(np.maximum(power, 1e-9))
+        level = np.clip(1 - db / self.floor_db, 0, 1)
+        self.level *= self.smoothing
+        self.level += (1 - self.smoothing) * level
+        np.maximum(self.peak * self.decay, self.level, out=self.peak)
+        return self.level
@@ -0,0 +1,58 @@
+"""
+Clocks used by BlinkyTape and the effects for waiting and time of day.
+
+SystemClock is the wall clock. VirtualClock only moves when something
+sleeps on it, so schedules and effects can be simulated as fast as the
+frames can be computed and give the same result on every run.
+"""
+import time
+import datetime
+
+
+class SystemClock(object):
+    def time(self):
+        """[seconds since the epoch]"""
+        return time.time()
+
+    def now(self):
+        """[local date and time]"""
+        return datetime.datetime.now()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, event, seconds):
+        """[waits for event for up to seconds, returns True if it was set]"""
+        return event.wait(seconds)
+
+
+class VirtualClock(object):
+    def __init__(self, start=datetime.datetime(2000, 1, 1, 12)):
+        """[clock advanced only by sleep and wait]
+
+        Arguments:
+            start {[datetime]} -- [date and time the clock starts at]
+        """
+        self.start = start
+        self.epoch = time.mktime(start.timetuple())
+        # kept absolute so deadlines computed from time() are hit exactly
+        self.current = self.epoch
+
+    @property
+    def elapsed(self):
+        """[seconds since the clock started]"""
+        return self.current - self.epoch
+
+    def time(self):
+        return self.current
+
+    def now(self):
+        return self.start + datetime.timedelta(seconds=self.elapsed)
+
+    def sleep(self, seconds):
+        self.current += max(seconds, 0)
+
+    def wait(self, event, seconds):
+        """[skips ahead, nothing can set the event during virtual time]"""
+        self.sleep(seconds)
+        return False
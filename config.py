@@ -0,0 +1,212 @@
+"""
+Hot-reloadable show configuration.
+
+The config file is JSON, every section is optional:
+
+    {
+        "hours": [16, 23],
+        "brightness": 200,
+        "power_budget": 1500,
+        "games": ["RocketLeague.exe", "TslGame.exe"],
+        "palettes": {"fire": ["black", "red3", "gold1", "yellow1"]},
+        "weights": {"fire": 3, "plasma": 3, "static": 0}
+    }
+
+A thread polls the file's mtime and parses it off the frame loop. A file
+that fails to parse or validate is logged and ignored, so the running
+show keeps the last good config. Good configs are handed to a frame hook
+and applied all at once at the next frame boundary, calling back only
+the sections whose value changed. A section removed from the file keeps
+its last value.
+"""
+import os
+import json
+import math
+import time
+import logging
+import threading
+import queue
+from color_constants import RGB
+
+
+def _hours(value):
+    start, end = [int(v) for v in value]
+    if not (0 <= start <= 24 and 0 <= end <= 24):
+        raise ValueError('hours must be within 0-24')
+    return (start, end)
+
+
+def _brightness(value):
+    return max(0, min(int(value), 255))
+
+
+def _power_budget(value):
+    # null turns the limiter off
+    if value is None:
+        return None
+    if float(value) <= 0:
+        raise ValueError('power_budget must be > 0 mA or null')
+    return float(value)
+
+
+def _games(value):
+    if isinstance(value, str):
+        raise ValueError('games must be a list of process names')
+    return [str(v) for v in value]
+
+
+def named_color(name):
+    """[looks up a color from the RGB class by name, case insensitive]"""
+    # RGB.colors misses some constants, ex: BLACK, so look up attributes
+    color = getattr(RGB, str(name).upper(), None)
+    if not isinstance(color, tuple):
+        raise ValueError('Unknown color ' + str(name))
+    return color
+
+
+def _palettes(value):
+    palettes = {}
+    for name, colors in value.items():
+        if len(colors) < 2:
+            raise ValueError('palette %s needs at least 2 colors' % name)
+        palettes[name] = tuple(named_color(c) for c in colors)
+    return palettes
+
+
+def _weights(value):
+    weights = dict((str(k), float(v)) for k, v in value.items())
+    if not all(math.isfinite(w) and w >= 0 for w in weights.values()) or \
+            not any(weights.values()):
+        raise ValueError('weights must be finite, >= 0 and not all 0')
+    return weights
+
+
+# section name -> function validating and normalizing its JSON value
+SECTIONS = {'hours': _hours, 'brightness': _brightness,
+            'power_budget': _power_budget, 'games': _games,
+            'palettes': _palettes, 'weights': _weights}
+
+
+def parse(text, effects=None):
+    """[parses and validates a config file]
+
+    Arguments:
+        text {[string]} -- [JSON document]
+        effects {[list]} -- [effect names accepted in weights, None
+                             accepts all]
+
+    Returns:
+        [dict] -- [normalized value of each section present]
+    """
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError('config must be a JSON object')
+    unknown = set(data) - set(SECTIONS)
+    if unknown:
+        raise ValueError('Unknown sections ' + ', '.join(sorted(unknown)))
+    values = dict((name, SECTIONS[name](value))
+                  for name, value in data.items())
+    if effects is not None and 'weights' in values:
+        unknown = set(values['weights']) - set(effects)
+        if unknown:
+            raise ValueError('Unknown effects in weights ' +
+                             ', '.join(sorted(unknown)))
+    return values
+
+
+class ConfigWatcher(object):
+    def __init__(self, path, bt, interval=1.0, effects=None):
+        """[reloads a config file and applies it in the frame loop of bt]
+
+        Arguments:
+            path {[string]} -- [JSON config file]
+            bt {[BlinkyTape]} -- [light controller object]
+            interval {[float]} -- [seconds between mtime checks]
+            effects {[list]} -- [effect names accepted in weights, None
+                                 accepts all]
+        """
+        self.path = path
+        self.effects = effects
+        self.bt = bt
+        self.interval = interval
+        self.values = {}  # sections applied so far
+        self.mtime = None
+        self.loaded = queue.Queue()
+        self.subscribers = {}
+        self.reloads = 0
+        self.errors = 0
+        bt.frame_hooks.append(self.apply)
+
+    def subscribe(self, section, callback):
+        """[registers a callback for changes of one section]
+
+        Called right away if the section was already applied.
+
+        Arguments:
+            section {[string]} -- [name from SECTIONS]
+            callback {[function]} -- [called as callback(value)]
+        """
+        self.subscribers.setdefault(section, []).append(callback)
+        if section in self.values:
+            callback(self.values[section])
+
+    def get(self, section, default=None):
+        return self.values.get(section, default)
+
+    def check(self):
+        """[reads the file if its mtime changed and queues it if valid]
+
+        Returns:
+            [bool] -- [True if a new config was queued]
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        try:
+            with open(self.path) as f:
+                values = parse(f.read(), self.effects)
+        except (ValueError, KeyError, TypeError, AttributeError,
+                OSError) as e:
+            self.errors += 1
+            logging.warning('Config %s ignored: %s' % (self.path, e))
+            return False
+        self.loaded.put(values)
+        self.bt.wake.set()
+        return True
+
+    def start(self):
+        """[loads the file now and polls it from a daemon thread]"""
+        self.check()
+        self.apply(self.bt)
+
+        def loop():
+            while True:
+                time.sleep(self.interval)
+                self.check()
+        thread = threading.Thread(target=loop)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def apply(self, bt):
+        """[frame hook applying the newest queued config]"""
+        values = None
+        while True:
+            try:
+                values = self.loaded.get_nowait()
+            except queue.Empty:
+                break
+        if values is None:
+            return
+        self.reloads += 1
+        changed = [name for name in SECTIONS
+                   if name in values and values[name] != self.values.get(name)]
+        self.values = dict(self.values, **values)
+        logging.info('Config reloaded, changed: ' + ', '.join(changed))
+        for name in changed:
+            for callback in self.subscribers.get(name, []):
+                callback(values[name])
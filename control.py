@@ -0,0 +1,187 @@
+"""
+Local control socket for changing a running light show.
+
+Clients send one JSON object per line and get one JSON object back:
+
+    {"cmd": "override", "on": true, "timeout": 30}
+    {"cmd": "brightness", "value": 128}
+    {"cmd": "effect", "name": "phase", "queue": false}
+    {"cmd": "status"}
+
+Commands are queued by the socket thread and applied by the frame loop at
+the next frame boundary, so the loop itself never touches the socket.
+Override timeouts are in minutes, up to MAX_TIMEOUT.
+"""
+import os
+import json
+import math
+import socket
+import logging
+import threading
+import queue
+from collections import deque
+
+SOCKET_PATH = '/tmp/blinkytape.sock'
+TCP_ADDRESS = ('127.0.0.1', 7890)
+MAX_TIMEOUT = 24 * 60  # longest override, in minutes
+
+
+class EffectInterrupted(Exception):
+    """Raised at a frame boundary to stop the effect that is running."""
+
+
+def _remove_stale(path):
+    """[removes a socket file left behind by an instance that is gone]
+
+    Raises:
+        RuntimeError -- [another instance is listening on path]
+    """
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (socket.error, OSError):
+        os.remove(path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError('Control socket %s is in use, pass another path'
+                       % path)
+
+
+class ControlServer(object):
+    def __init__(self, bt, address=None, effects=None):
+        """[listens for commands and hooks into the frame loop of bt]
+
+        A leftover unix socket file is replaced, but RuntimeError is raised
+        if another instance is still listening on it.
+
+        Arguments:
+            bt {[BlinkyTape]} -- [light controller object]
+            address {[string]} -- [unix socket path or (host, port) tuple,
+                                   defaults to SOCKET_PATH or TCP_ADDRESS]
+            effects {[list]} -- [effect names accepted, None accepts all]
+        """
+        self.bt = bt
+        self.effects = effects
+        self.commands = queue.Queue()
+        self.queued = deque()  # effects waiting to run, applied commands only
+        self.current = None  # effect running, set by the driver
+        if address is None:
+            address = SOCKET_PATH if hasattr(socket, 'AF_UNIX') else TCP_ADDRESS
+        if isinstance(address, tuple):
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        else:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            _remove_stale(address)
+        self.sock.bind(address)
+        self.sock.listen(4)
+        self.address = self.sock.getsockname()
+        bt.frame_hooks.append(self.apply)
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def serve_forever(self):
+        """[accepts clients, one thread each]"""
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except (socket.error, OSError):
+                return
+            thread = threading.Thread(target=self.handle, args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    def handle(self, conn):
+        """[answers command lines from one client until it disconnects]"""
+        with conn:
+            for line in conn.makefile('r'):
+                if not line.strip():
+                    continue
+                try:
+                    reply = self.submit(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    reply = {'ok': False, 'error': str(e)}
+                conn.sendall((json.dumps(reply) + '\n').encode('utf8'))
+
+    def submit(self, command):
+        """[validates a command and queues it for the frame loop]
+
+        Arguments:
+            command {[dict]} -- [decoded JSON command]
+
+        Returns:
+            [dict] -- [reply for the client]
+        """
+        cmd = command['cmd']
+        if cmd == 'status':
+            return self.status()
+        if cmd == 'override':
+            timeout = float(command.get('timeout', 30))
+            if not (math.isfinite(timeout) and 0 <= timeout <= MAX_TIMEOUT):
+                raise ValueError('timeout must be 0-%d minutes' % MAX_TIMEOUT)
+            command = {'cmd': cmd, 'on': bool(command['on']),
+                       'timeout': timeout}
+        elif cmd == 'brightness':
+            command = {'cmd': cmd, 'value': int(command['value'])}
+        elif cmd == 'effect':
+            if self.effects is not None and command['name'] not in self.effects:
+                raise ValueError('Unknown effect ' + str(command['name']))
+            command = {'cmd': cmd, 'name': command['name'],
+                       'queue': bool(command.get('queue', False))}
+        else:
+            raise ValueError('Unknown command ' + str(cmd))
+        self.commands.put(command)
+        self.bt.wake.set()
+        return {'ok': True}
+
+    def status(self):
+        """[returns a snapshot of the show state]"""
+        return {'ok': True, 'override': self.bt.override,
+                'brightness': self.bt.brightness, 'active': self.bt.active(),
+                'effect': self.current, 'queued': list(self.queued)}
+
+    def apply(self, bt):
+        """[frame hook applying queued commands]
+
+        Raises EffectInterrupted when an effect switch was requested,
+        otherwise resends the current frame after brightness or override
+        changes.
+        """
+        interrupt = refresh = False
+        while True:
+            try:
+                command = self.commands.get_nowait()
+            except queue.Empty:
+                break
+            logging.info('Control: ' + str(command))
+            if command['cmd'] == 'override':
+                bt.set_override(command['on'], command['timeout'])
+                refresh = True
+            elif command['cmd'] == 'brightness':
+                bt.set_brightness(command['value'])
+                refresh = True
+            elif command['queue']:
+                self.queued.append(command['name'])
+            else:
+                self.queued.appendleft(command['name'])
+                interrupt = True
+        if interrupt:
+            raise EffectInterrupted()
+        if refresh:
+            # static effects hold one frame for a minute, show the change now
+            bt.refresh()
+
+    def next_effect(self):
+        """[returns the next requested effect name, or None]"""
+        if self.queued:
+            return self.queued.popleft()
+        return None
+
+    def close(self):
+        """[stops listening and detaches from the frame loop]"""
+        self.bt.frame_hooks.remove(self.apply)
+        self.sock.close()
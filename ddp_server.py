@@ -0,0 +1,152 @@
+"""
+UDP listener for the Distributed Display Protocol (DDP) feeding BlinkyTape.
+
+Packets carry a 10 byte header (flags, sequence, type, id, offset, length)
+followed by RGB data, and a packet with the PUSH flag marks the end of a
+frame. See http://www.3waylabs.com/ddp/
+"""
+import socket
+import select
+import struct
+import logging
+
+DDP_PORT = 4048
+HEADER = struct.Struct('>BBBBIH')
+TIMECODE_SIZE = 4
+MAX_PAYLOAD = 1440
+
+FLAG_VERSION = 0xc0
+VERSION_1 = 0x40
+FLAG_TIMECODE = 0x10
+FLAG_QUERY = 0x02
+FLAG_PUSH = 0x01
+ID_DISPLAY = 1
+
+
+def pack_packets(frame, sequence=1):
+    """[splits a frame into DDP packets, the last one pushes]
+
+    Arguments:
+        frame {[bytes]} -- [RGB pixel data]
+        sequence {[int]} -- [sequence number of the first packet, 1-15
+                             incrementing per packet, 0 disables checks]
+
+    Returns:
+        [list] -- [packets ready for sendto]
+    """
+    packets = []
+    for offset in range(0, max(len(frame), 1), MAX_PAYLOAD):
+        if sequence:
+            sequence = (sequence - 1) % 15 + 1
+        chunk = frame[offset:offset + MAX_PAYLOAD]
+        flags = VERSION_1
+        if offset + MAX_PAYLOAD >= len(frame):
+            flags |= FLAG_PUSH
+        packets.append(HEADER.pack(flags, sequence, 0x01, ID_DISPLAY,
+                                   offset, len(chunk)) + bytes(chunk))
+        if sequence:
+            sequence += 1
+    return packets
+
+
+class DDPServer(object):
+    def __init__(self, bt, host='0.0.0.0', port=DDP_PORT):
+        """[receives DDP frames and shows them on a BlinkyTape]
+
+        Arguments:
+            bt {[BlinkyTape]} -- [light controller object]
+            host {[string]} -- [address to bind]
+            port {[int]} -- [UDP port, 0 picks a free one]
+        """
+        self.bt = bt
+        self.frame = bytearray(3 * bt.get_led_count())
+        # copy of frame taken at the last push, what poll() shows
+        self.pushed = bytearray(len(self.frame))
+        self.packet = bytearray(65536)
+        self.view = memoryview(self.packet)
+        self.sequences = {}  # sender -> last sequence number seen
+        self.stats = {'packets': 0, 'dropped': 0, 'frames': 0}
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+
+    def in_order(self, sender, sequence):
+        """[checks a sequence number against the last one from sender]
+
+        Sequence numbers wrap 1-15, anything that is not ahead of the last
+        packet by less than half the range is a duplicate or late packet.
+        """
+        if sequence == 0:
+            return True
+        last = self.sequences.get(sender)
+        if last is not None and not 0 < (sequence - last) % 15 < 8:
+            return False
+        self.sequences[sender] = sequence
+        return True
+
+    def handle_packet(self, size, sender):
+        """[copies a received packet into the frame]
+
+        Arguments:
+            size {[int]} -- [bytes received into self.packet]
+            sender {[tuple]} -- [address the packet came from]
+
+        Returns:
+            [bool] -- [True if the packet completed a frame]
+        """
+        self.stats['packets'] += 1
+        if size < HEADER.size:
+            self.stats['dropped'] += 1
+            return False
+        flags, sequence, _, dest, offset, length = \
+            HEADER.unpack_from(self.packet)
+        if flags & FLAG_VERSION != VERSION_1 or flags & FLAG_QUERY or \
+                dest not in (0, ID_DISPLAY) or \
+                not self.in_order(sender, sequence & 0x0f):
+            self.stats['dropped'] += 1
+            return False
+        start = HEADER.size + (TIMECODE_SIZE if flags & FLAG_TIMECODE else 0)
+        length = min(length, size - start, len(self.frame) - offset)
+        if length > 0:
+            self.frame[offset:offset + length] = \
+                self.view[start:start + length]
+        return bool(flags & FLAG_PUSH)
+
+    def poll(self, timeout=0.1):
+        """[drains queued packets and shows the latest complete frame]
+
+        Arguments:
+            timeout {[float]} -- [seconds to wait for the first packet]
+
+        Returns:
+            [bool] -- [True if a frame was sent to the tape]
+        """
+        if not select.select([self.sock], [], [], timeout)[0]:
+            return False
+        pushed = False
+        while True:
+            try:
+                size, sender = self.sock.recvfrom_into(self.packet)
+            except (socket.error, OSError):
+                break
+            if self.handle_packet(size, sender):
+                # packets of the next frame may already be queued behind
+                # this one, keep the frame as it was at the push
+                self.pushed[:] = self.frame
+                pushed = True
+        if pushed:
+            self.stats['frames'] += 1
+            self.bt.send_frame(self.pushed)
+        return pushed
+
+    def serve_forever(self):
+        """[shows frames until interrupted]"""
+        logging.info('DDP listening on %s:%s' % self.address)
+        while True:
+            self.poll()
+
+    def close(self):
+        """[closes the socket]"""
+        self.sock.close()
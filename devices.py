@@ -0,0 +1,99 @@
+"""
+Serial device discovery for BlinkyTape without shelling out to ls/mode.
+"""
+import os
+import platform
+import time
+import logging
+
+# (VID, PID) pairs reported by BlinkyTape controllers
+BLINKYTAPE_IDS = [(0x1d50, 0x605e)]
+DEV_PREFIXES = ('ttyACM', 'ttyUSB')
+
+
+def read_usb_ids(name, sys_root='/sys/class/tty'):
+    """[reads the USB vendor/product id of a tty from sysfs]
+
+    Arguments:
+        name {[string]} -- [tty name, ex: ttyACM0]
+        sys_root {[string]} -- [sysfs tty class directory]
+
+    Returns:
+        [tuple] -- [(vid, pid) or None when unknown]
+    """
+    path = os.path.realpath(os.path.join(sys_root, name, 'device'))
+    # ttyACM sits on the interface, ttyUSB one level further down
+    for _ in range(4):
+        try:
+            with open(os.path.join(path, 'idVendor')) as f:
+                vid = int(f.read().strip(), 16)
+            with open(os.path.join(path, 'idProduct')) as f:
+                pid = int(f.read().strip(), 16)
+            return vid, pid
+        except (IOError, OSError, ValueError):
+            path = os.path.dirname(path)
+    return None
+
+
+def list_serial_devices(ids=None, dev_root='/dev', sys_root='/sys/class/tty'):
+    """[lists candidate serial ports, optionally filtered by VID/PID]
+
+    Arguments:
+        ids {[list]} -- [(vid, pid) pairs to accept, None accepts all]
+        dev_root {[string]} -- [device directory]
+        sys_root {[string]} -- [sysfs tty class directory]
+
+    Returns:
+        [list] -- [port names sorted by name]
+    """
+    if platform.system() != 'Linux':
+        from serial.tools import list_ports
+        return sorted(p.device for p in list_ports.comports()
+                      if ids is None or (p.vid, p.pid) in ids)
+    try:
+        names = sorted(n for n in os.listdir(dev_root)
+                       if n.startswith(DEV_PREFIXES))
+    except OSError:
+        return []
+    if ids is not None:
+        names = [n for n in names if read_usb_ids(n, sys_root) in ids]
+    return [os.path.join(dev_root, n) for n in names]
+
+
+def find_device(ids=BLINKYTAPE_IDS, fallback=False, **kwargs):
+    """[returns the first BlinkyTape port]
+
+    Arguments:
+        ids {[list]} -- [(vid, pid) pairs to accept, None accepts all]
+        fallback {[bool]} -- [returns any serial port when no id matches,
+                              never use it to reconnect, it may pick an
+                              unrelated device]
+
+    Returns:
+        [string] -- [port name or None if nothing is attached]
+    """
+    ports = list_serial_devices(ids, **kwargs)
+    if not ports and ids is not None and fallback:
+        ports = list_serial_devices(None, **kwargs)
+    return ports[0] if ports else None
+
+
+def wait_for_device(ids=BLINKYTAPE_IDS, timeout=None, interval=0.5, **kwargs):
+    """[blocks until a device shows up]
+
+    Arguments:
+        timeout {[float]} -- [seconds to wait, None waits forever]
+        interval {[float]} -- [seconds between scans]
+
+    Returns:
+        [string] -- [port name or None on timeout]
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    while True:
+        port = find_device(ids, **kwargs)
+        if port is not None:
+            return port
+        if deadline is not None and time.time() >= deadline:
+            return None
+        logging.debug('Waiting for USB device')
+        time.sleep(interval)
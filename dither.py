@@ -0,0 +1,57 @@
+"""
+Temporal dithering output stage for BlinkyTape.
+
+Effects render frames in float precision and the stage quantizes them to
+the 0-254 range of the wire protocol, carrying each pixel's rounding error
+over to the next frame. Over a few frames the average output matches the
+fractional value, which smooths slow fades at low brightness.
+"""
+import numpy as np
+
+
+class TemporalDither(object):
+    def __init__(self, led_count, max_value=254):
+        """[error diffusion over time, one error term per channel]
+
+        Arguments:
+            led_count {[int]} -- [number of LEDs]
+            max_value {[int]} -- [highest value the output can hold]
+        """
+        self.max_value = max_value
+        # a different starting error per channel keeps LEDs showing the
+        # same value from stepping, and flickering, all in the same frame
+        self.offsets = np.random.RandomState(0).uniform(
+            -0.5, 0.5, (led_count, 3)).astype(np.float32)
+        self.error = self.offsets.copy()
+        self.work = np.zeros((led_count, 3), dtype=np.float32)
+        self.quant = np.zeros((led_count, 3), dtype=np.float32)
+        self.out = np.zeros((led_count, 3), dtype=np.uint8)
+
+    def reset(self):
+        """[drops the accumulated error]"""
+        self.error[:] = self.offsets
+
+    def __call__(self, frame):
+        """[quantizes a frame, usable as a BlinkyTape output stage]
+
+        Integer frames pass through unchanged.
+
+        Arguments:
+            frame {[array]} -- [(n, 3) float frame with values in 0-255]
+
+        Returns:
+            [array] -- [(n, 3) uint8 frame, reused between calls]
+        """
+        if getattr(frame, 'dtype', None) is None or frame.dtype.kind != 'f':
+            return frame
+        n = len(frame)
+        work, quant = self.work[:n], self.quant[:n]
+        error, out = self.error[:n], self.out[:n]
+        np.add(frame, error, out=work)
+        np.floor(work + 0.5, out=quant)
+        np.clip(quant, 0, self.max_value, out=quant)
+        # error past the output range is dropped so it cannot wind up
+        np.subtract(work, quant, out=error)
+        np.clip(error, -1, 1, out=error)
+        out[:] = quant
+        return out
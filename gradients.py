@@ -0,0 +1,113 @@
+"""
+Gradient lookup tables blended in a perceptual color space.
+
+Blending two colors channel by channel in RGB passes through dull, dark
+middles (red to green goes through a muddy olive). Converting the stops
+to OKLab or CIELAB first, interpolating there and converting back keeps
+lightness and saturation even along the gradient. Tables are built once
+per (colors, entries, space, dtype) and cached, so effects only index
+into them each frame.
+"""
+import numpy as np
+from functools import lru_cache
+from config import named_color
+
+# linear sRGB to XYZ, D65 white
+XYZ = np.array([[0.4124564, 0.3575761, 0.1804375],
+                [0.2126729, 0.7151522, 0.0721750],
+                [0.0193339, 0.1191920, 0.9503041]])
+WHITE = np.array([0.95047, 1.0, 1.08883])
+# linear sRGB to LMS cone response and cube root LMS to OKLab
+LMS = np.array([[0.4122214708, 0.5363325363, 0.0514459929],
+                [0.2119034982, 0.6806995451, 0.1073969566],
+                [0.0883024619, 0.2817188376, 0.6299787005]])
+OKLAB = np.array([[0.2104542553, 0.7936177850, -0.0040720468],
+                  [1.9779984951, -2.4285922050, 0.4505937099],
+                  [0.0259040371, 0.7827717662, -0.8086757660]])
+DELTA = 6.0 / 29
+XYZ_INV = np.linalg.inv(XYZ)
+LMS_INV = np.linalg.inv(LMS)
+OKLAB_INV = np.linalg.inv(OKLAB)
+
+
+def to_linear(rgb):
+    """[sRGB in 0-1 to linear light]"""
+    return np.where(rgb <= 0.04045, rgb / 12.92,
+                    ((rgb + 0.055) / 1.055) ** 2.4)
+
+
+def from_linear(linear):
+    """[linear light to sRGB in 0-1]"""
+    linear = np.clip(linear, 0, 1)
+    return np.where(linear <= 0.0031308, linear * 12.92,
+                    1.055 * linear ** (1 / 2.4) - 0.055)
+
+
+def to_oklab(rgb):
+    """[(n, 3) sRGB in 0-1 to OKLab]"""
+    return np.cbrt(to_linear(rgb).dot(LMS.T)).dot(OKLAB.T)
+
+
+def from_oklab(lab):
+    """[(n, 3) OKLab to sRGB in 0-1, clipped to the gamut]"""
+    lms = lab.dot(OKLAB_INV.T) ** 3
+    return from_linear(lms.dot(LMS_INV.T))
+
+
+def to_lab(rgb):
+    """[(n, 3) sRGB in 0-1 to CIELAB]"""
+    t = to_linear(rgb).dot(XYZ.T) / WHITE
+    f = np.where(t > DELTA ** 3, np.cbrt(t), t / (3 * DELTA ** 2) + 4.0 / 29)
+    return np.stack([116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]),
+                     200 * (f[:, 1] - f[:, 2])], axis=1)
+
+
+def from_lab(lab):
+    """[(n, 3) CIELAB to sRGB in 0-1, clipped to the gamut]"""
+    fy = (lab[:, 0] + 16) / 116
+    f = np.stack([fy + lab[:, 1] / 500, fy, fy - lab[:, 2] / 200], axis=1)
+    t = np.where(f > DELTA, f ** 3, 3 * DELTA ** 2 * (f - 4.0 / 29))
+    return from_linear((t * WHITE).dot(XYZ_INV.T))
+
+
+# space name -> (from sRGB, to sRGB)
+SPACES = {
+    'rgb': (lambda rgb: rgb, lambda rgb: np.clip(rgb, 0, 1)),
+    'linear': (to_linear, from_linear),
+    'oklab': (to_oklab, from_oklab),
+    'lab': (to_lab, from_lab),
+}
+
+
+def _rgb(color):
+    return named_color(color) if isinstance(color, str) else color
+
+
+@lru_cache(maxsize=64)
+def gradient(colors, n=256, space='oklab', dtype='uint8'):
+    """[lookup table blending evenly spaced colors]
+
+    Arguments:
+        colors {[tuple]} -- [colors from RGB class or their names, ex:
+                             ('navy', 'gold1')]
+        n {[int]} -- [table entries]
+        space {[string]} -- [space blended in, one of SPACES]
+        dtype {[string]} -- ['uint8', or 'float32' to keep the fractions
+                             for a temporal dither stage]
+
+    Returns:
+        [array] -- [read only (n, 3) table with values in 0-255]
+    """
+    to_space, from_space = SPACES[space]
+    stops = np.array([_rgb(c) for c in colors], dtype=np.float64) / 255
+    stops = to_space(stops)
+    at = np.linspace(0, 1, n)
+    where = np.linspace(0, 1, len(colors))
+    blend = np.stack([np.interp(at, where, stops[:, c]) for c in range(3)],
+                     axis=1)
+    table = 255 * from_space(blend)
+    if np.dtype(dtype) == np.uint8:
+        table = np.rint(table)
+    table = table.astype(dtype)
+    table.flags.writeable = False
+    return table
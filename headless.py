@@ -0,0 +1,246 @@
+"""
+Headless BlinkyTape for rendering effects without hardware.
+
+HeadlessTape records every frame that would go over the wire and runs on
+a VirtualClock that sleep() advances instantly, so effects render much
+faster than real time. Recorded frames can be written as a strip PNG, a
+time x LED heatmap PNG, an animated GIF or ANSI truecolor text, and
+compared against golden images for regression tests.
+"""
+import sys
+import zlib
+import struct
+import hashlib
+import numpy as np
+from BlinkyTape import BlinkyTape
+from clock import VirtualClock
+
+
+class HeadlessTape(BlinkyTape):
+    def __init__(self, ledCount=60, always_on=True, record=True, **kwargs):
+        """[BlinkyTape that records frames instead of opening a port]
+
+        Arguments:
+            ledCount {[int]} -- [number of LEDs]
+            always_on {[bool]} -- [ignores the on hours]
+            record {[bool]} -- [keeps every frame, otherwise only the
+                                digest and count are updated]
+        """
+        self.frames = []  # (ledCount, 3) uint8 arrays, one per show
+        self.times = []  # clock time of each frame in seconds
+        self.always_on = always_on
+        self.record = record
+        self.frame_count = 0
+        self.digest = hashlib.sha1()  # of every frame shown, in order
+        self.wire = bytearray()
+        self.pixels = np.zeros((ledCount, 3), dtype=np.uint8)
+        kwargs.setdefault('clock', VirtualClock())
+        BlinkyTape.__init__(self, None, ledCount, lazy=True, **kwargs)
+
+    def active(self):
+        return self.always_on or BlinkyTape.active(self)
+
+    def _flush_input(self):
+        pass
+
+    def durations(self):
+        """[returns how long each recorded frame stayed on the strip]"""
+        return list(np.diff(self.times + [self.clock.time()]))
+
+    def _write(self, data, replay=b"", drain=True):
+        """[decodes the wire format into frames]"""
+        self.wire += data
+        while True:
+            end = self.wire.find(b'\xff')
+            if end < 0:
+                return
+            data = self.wire[:end - end % 3]
+            del self.wire[:end + 1]
+            # the firmware keeps pixels past the end of a short frame
+            self.pixels[:len(data) // 3] = \
+                np.frombuffer(bytes(data), dtype=np.uint8).reshape(-1, 3)
+            self.frame_count += 1
+            self.digest.update(self.pixels)
+            if self.record:
+                self.frames.append(self.pixels.copy())
+                self.times.append(self.clock.time())
+
+
+def render(effect, led_count=60, *args, **kwargs):
+    """[runs an effect on a HeadlessTape]
+
+    Arguments:
+        effect {[function]} -- [effect taking the tape as first argument]
+        led_count {[int]} -- [number of LEDs]
+
+    Returns:
+        [HeadlessTape] -- [tape holding the recorded frames]
+    """
+    tape = HeadlessTape(led_count)
+    effect(tape, *args, **kwargs)
+    return tape
+
+
+def strip_image(frame, height=8, scale=8):
+    """[draws one frame as a row of LED blocks]
+
+    Returns:
+        [array] -- [(height, leds * scale, 3) uint8 image]
+    """
+    return np.repeat(np.repeat(frame[None], height, axis=0), scale, axis=1)
+
+
+def heatmap(frames):
+    """[stacks frames into a time x LED image, one row per frame]"""
+    return np.stack(frames)
+
+
+def write_png(path, image):
+    """[writes an (h, w, 3) uint8 image as an 8 bit RGB PNG]"""
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width = image.shape[:2]
+    rows = np.zeros((height, 1 + 3 * width), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, -1)  # filter type 0 on every row
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + \
+            struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height,
+                                           8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)))
+        f.write(chunk(b'IEND', b''))
+
+
+def read_png(path):
+    """[reads a PNG written by write_png]
+
+    Returns:
+        [array] -- [(h, w, 3) uint8 image]
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    pos, idat = 8, b''
+    while pos < len(data):
+        length, kind = struct.unpack('>I4s', data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        if kind == b'IHDR':
+            width, height, depth, color, _, _, interlace = \
+                struct.unpack('>IIBBBBB', body)
+            if (depth, color, interlace) != (8, 2, 0):
+                raise ValueError('Only 8 bit RGB PNGs are supported')
+        elif kind == b'IDAT':
+            idat += body
+        pos += 12 + length
+    rows = np.frombuffer(zlib.decompress(idat), dtype=np.uint8)
+    rows = rows.reshape(height, 1 + 3 * width)
+    if rows[:, 0].any():
+        raise ValueError('Only unfiltered PNGs are supported')
+    return rows[:, 1:].reshape(height, width, 3).copy()
+
+
+def compare_golden(image, path, tolerance=0):
+    """[checks an image against a golden PNG]
+
+    Arguments:
+        image {[array]} -- [(h, w, 3) uint8 image, ex: from heatmap]
+        path {[string]} -- [golden PNG]
+        tolerance {[int]} -- [largest channel difference accepted]
+
+    Returns:
+        [bool] -- [True if shapes match and no channel differs by more
+                   than tolerance]
+    """
+    golden = read_png(path)
+    if golden.shape != image.shape:
+        return False
+    diff = np.abs(golden.astype(np.int16) - image.astype(np.int16))
+    return int(diff.max()) <= tolerance if diff.size else True
+
+
+def _lzw(indices, min_size=8):
+    """[GIF flavoured LZW compression of palette indices]"""
+    clear, end = 1 << min_size, (1 << min_size) + 1
+    out = bytearray()
+    bits = nbits = 0
+    size, next_code, table = min_size + 1, end + 1, {}
+
+    def emit(code, size):
+        nonlocal bits, nbits
+        bits |= code << nbits
+        nbits += size
+        while nbits >= 8:
+            out.append(bits & 0xff)
+            bits >>= 8
+            nbits -= 8
+
+    emit(clear, size)
+    prefix = indices[0]
+    for k in indices[1:]:
+        code = table.get((prefix, k))
+        if code is not None:
+            prefix = code
+            continue
+        emit(prefix, size)
+        if next_code < 4096:
+            table[(prefix, k)] = next_code
+            next_code += 1
+            if next_code > (1 << size) and size < 12:
+                size += 1
+        else:
+            emit(clear, size)
+            size, next_code, table = min_size + 1, end + 1, {}
+        prefix = k
+    emit(prefix, size)
+    emit(end, size)
+    if nbits:
+        out.append(bits & 0xff)
+    return bytes(out)
+
+
+def write_gif(path, images, delays):
+    """[writes an animated, looping GIF]
+
+    Colors are reduced to a 6x6x6 color cube.
+
+    Arguments:
+        images {[list]} -- [(h, w, 3) uint8 images]
+        delays {[list]} -- [seconds each image is shown]
+    """
+    levels = np.rint(np.linspace(0, 255, 6)).astype(np.uint8)
+    cube = np.stack(np.meshgrid(levels, levels, levels, indexing='ij'),
+                    axis=-1).reshape(-1, 3)
+    table = np.zeros((256, 3), dtype=np.uint8)
+    table[:len(cube)] = cube
+    height, width = images[0].shape[:2]
+    with open(path, 'wb') as f:
+        f.write(b'GIF89a' + struct.pack('<HHBBB', width, height, 0xf7, 0, 0))
+        f.write(table.tobytes())
+        f.write(b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00')
+        for image, delay in zip(images, delays):
+            q = (image.astype(np.uint16) * 5 + 127) // 255
+            indices = (q[..., 0] * 36 + q[..., 1] * 6 + q[..., 2]).ravel()
+            f.write(b'\x21\xf9\x04\x00' +
+                    struct.pack('<H', int(round(delay * 100))) + b'\x00\x00')
+            f.write(b'\x2c' + struct.pack('<HHHHB', 0, 0, width, height, 0))
+            data = _lzw(indices.astype(np.uint8).tolist())
+            f.write(b'\x08')
+            for i in range(0, len(data), 255):
+                block = data[i:i + 255]
+                f.write(struct.pack('B', len(block)) + block)
+            f.write(b'\x00')
+        f.write(b'\x3b')
+
+
+def ansi(frame):
+    """[formats a frame as a line of ANSI truecolor blocks]"""
+    cells = ''.join('\x1b[48;2;%d;%d;%dm ' % tuple(p) for p in frame.tolist())
+    return cells + '\x1b[0m'
+
+
+def play_ansi(tape, stream=sys.stdout):
+    """[prints every recorded frame of a tape on its own line]"""
+    for frame in tape.frames:
+        stream.write(ansi(frame) + '\n')
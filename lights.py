@@ -2,56 +2,91 @@
 Code by Anthony Bisulco to control Blinky Tape lights
 """
 import platform
+import socket
 import sys
 import logging
 import re
 import math
-import time
 import random
+import threading
+import time
 import numpy as np
 from subprocess import Popen, PIPE
+import devices
+import segments
+from particles import ParticleSystem
+import noise_tables
+import gradients
+from audio import SpectrumAnalyzer
+from dither import TemporalDither
+from clock import SystemClock, VirtualClock
+from headless import HeadlessTape
+from power import PowerLimiter
 from BlinkyTape import BlinkyTape
+from process_watcher import ProcessWatcher
+from log_utils import setup_logging, EventCounter
+from control import ControlServer, EffectInterrupted, SOCKET_PATH
+from metrics import Metrics, METRICS_ADDRESS
+from config import ConfigWatcher
+from show_file import ShowReader
+import timeline
 from color_constants import RGB
 from collections import namedtuple, OrderedDict
-import colorsys
+import argparse
+import cProfile
+import functools
+import itertools
+import pstats
+import timeit
 
 
-def find_usb_dev():
+def find_usb_dev(fallback=False):
     """[Function to return usb device on system ]
 
+    Arguments:
+        fallback {[bool]} -- [returns any serial port if no BlinkyTape is
+                              found, see devices.find_device]
+
     Returns:
-        [string] -- [returns list of USB devices]
+        [string] -- [first BlinkyTape serial port, None if nothing attached]
     """
-    if platform.system() == 'Windows':
-        logging.info('Platform: Windows')
-        process = Popen("mode",
-                        shell=True, stdout=PIPE, stderr=PIPE)
-        std_out, std_err = process.communicate()
-        usb_dev = re.search("COM\d",
-                            std_out.decode("utf8")).group()
-        logging.debug(std_err)
-        if not std_out:
-            logging.debug("No USB Devices")
-            sys.exit(-1)
-        logging.debug(usb_dev)
-        return usb_dev
-    elif platform.system() == 'Linux':
-        logging.info('Platform: Linux')
-        process = Popen("ls /dev/ | grep -E '(ttyACM*|ttyUSB*)'",
-                        shell=True, stdout=PIPE, stderr=PIPE)
-        std_out, std_err = process.communicate()
-        std_out = std_out.decode("utf8")
-        logging.debug(std_err)
-        if not std_out:
-            logging.debug("No USB Devices")
-            sys.exit(-1)
-        logging.debug(std_out)
-
-        return '/dev/' + std_out.split('\n')[0]
+    logging.info('Platform: ' + platform.system())
+    usb_dev = devices.find_device(fallback=fallback)
+    if usb_dev is None:
+        logging.debug("No USB Devices")
     else:
-        logging.debug('Platform: Unknown exiting')
-        sys.exit(-1)
-        return -1
+        logging.debug(usb_dev)
+    return usb_dev
+
+
+def frame_times(bt, freq, duration):
+    """[paces an effect, yields seconds since its start once per frame]
+
+    Frames are scheduled against bt.clock rather than counted, so a slow
+    frame shortens the next wait, frames are dropped when the host falls
+    behind and the effect always lasts duration seconds. Effects computed
+    from the yielded time look the same at any frame rate. Dropped frames
+    are counted in bt.stats['dropped'].
+
+    Arguments:
+        bt {[BlinkyTape]} -- [light controller object]
+        freq {[float]} -- [frames per second]
+        duration {[float]} -- [seconds]
+    """
+    period = 1.0 / freq
+    start = bt.clock.time()
+    end = start + duration
+    now = start
+    n = 0
+    while now < end:
+        yield now - start
+        now = bt.clock.time()
+        late = int((now - start) / period) + 1
+        if late > n + 1:
+            bt.stats['dropped'] += late - n - 1
+        n = max(n + 1, late)
+        bt.sleep(min(start + n * period, end) - now)
+        now = bt.clock.time()
 
 
 def set_static_color(bt, col):
@@ -63,10 +98,9 @@ def set_static_color(bt, col):
     """
     ret = bt.displayColor(col.red, col.green, col.blue)
     if ret == 1:
-        logging.debug("Set Color to (%s,%s,%s)" %
-                      (col.red, col.green, col.blue))
+        events.count("Set Color")
     else:
-        logging.debug("Shutting off lights, off hours")
+        events.count("Shutting off lights, off hours")
 
 
 def two_color_swap(bt, col1, col2, freq=10, duration=10):
@@ -76,85 +110,52 @@ def two_color_swap(bt, col1, col2, freq=10, duration=10):
         col1 {[RGB]} -- [color from RGB class]
         col2 {[RGB]} -- [color from RGB class]
         freq {[float]} -- [number of times per second transition occurs]
-        duration {[int]} -- [length effect occurs]
+        duration {[float]} -- [length effect occurs in seconds]
         bt {[BlinkyTape]} -- [light controller object]
     """
-    for a in range(0, freq * duration):
-        for i in range(0, bt.get_led_count()):
-            if i % 2 == 0:
-                bt.sendPixel(col1.red, col1.green, col1.blue)
-            else:
-                bt.sendPixel(col2.red, col2.green, col2.blue)
-        bt.show()
-        time.sleep(1 / freq)
-        for i in range(0, bt.get_led_count()):
-            if i % 2 == 1:
-                bt.sendPixel(col1.red, col1.green, col1.blue)
-            else:
-                bt.sendPixel(col2.red, col2.green, col2.blue)
-        bt.show()
-        time.sleep(1 / freq)
-
-
-def color_fade(bt, col1, col2, duration=100):
+    frames = [segments.repeat_pattern(segments.new_frame(bt.get_led_count()),
+                                      [col1, col2], offset)
+              for offset in (0, 1)]
+    for t in frame_times(bt, freq, duration):
+        bt.send_frame(frames[int(t * freq) % 2])
+
+
+def color_fade(bt, col1, col2, duration=100, freq=30):
     """[makes the color transition from col1 to col2 over duration]
 
+    Colors are blended in OKLab through a cached gradient table, kept in
+    float precision so a temporal dither stage on bt can smooth the steps
+    of slow fades.
+
     Arguments:
         col1 {[RGB]} -- [color from RGB class]
         col2 {[RGB]} -- [color from RGB class]
-        duration {[int]} -- [length effect occurs]
+        duration {[float]} -- [length effect occurs in seconds]
+        freq {[float]} -- [frames per second]
         bt {[BlinkyTape]} -- [light controller object]
     """
     set_static_color(bt, col1)
-    delta = [col2.red - col1.red, col2.green -
-             col1.green, col2.blue - col1.blue]
+    lut = gradients.gradient((col1, col2), 1024, 'oklab', 'float32')
+    frame = np.empty((bt.get_led_count(), 3), dtype=np.float32)
+    for t in frame_times(bt, freq, duration):
+        frame[:] = lut[int(t / duration * (len(lut) - 1))]
+        bt.send_frame(frame)
+    frame[:] = lut[-1]
+    bt.send_frame(frame)
 
-    RGB = namedtuple('RGB', 'red, green, blue')
-    red = col1.red
-    green = col1.green
-    blue = col1.blue
-    wait_time = duration / max(delta)
-    for i in range(0, max(delta)):
-        if delta[0] > 0:
-            red += 1
-            delta[0] += 1
-        elif delta[0] < 0:
-            red -= 1
-            delta[0] -= 1
-        if delta[1] > 0:
-            green += 1
-            delta[1] += 1
-        elif delta[1] < 0:
-            green -= 1
-            delta[1] -= 1
-        if delta[2] > 0:
-            blue += 1
-            delta[2] += 1
-        elif delta[2] < 0:
-            blue -= 1
-            delta[2] -= 1
-        set_static_color(bt, RGB(red, green, blue))
-        time.sleep(wait_time)
-
-
-def color_phase(bt, freq=10, duration=10):
+
+def color_phase(bt, speed=50, freq=60, duration=10):
     """[makes a rainbow effect]
 
     Arguments:
-        freq {[float]} -- [number of times per second transition occurs]
-        duration {[int]} -- [length effect occurs]
+        speed {[float]} -- [degrees per second the hues rotate]
+        freq {[float]} -- [frames per second]
+        duration {[float]} -- [length effect occurs in seconds]
         bt {[BlinkyTape]} -- [light controller object]
     """
     colors = np.linspace(0, 360, bt.get_led_count())
-    for a in range(0, duration * freq):
-        for i in range(0, bt.get_led_count()):
-            color_vals = colorsys.hsv_to_rgb(colors[i] / 360, 0.9, 0.9)
-            bt.sendPixel(
-                int(255 * color_vals[0]), int(255 * color_vals[1]), int(255 * color_vals[2]))
-        bt.show()
-        colors = colors + 5
-        colors[colors > 360] = colors[colors > 360] - 360
-        time.sleep(1 / freq)
+    for t in frame_times(bt, freq, duration):
+        bt.send_frame(segments.hsv(colors + speed * t, 0.9, 0.9))
 
 
 def gpu_color(bt):
@@ -173,14 +174,81 @@ def gpu_color(bt):
         return
         logging.debug("Unknown OS")
     std_out, std_err = process.communicate()
-    gpu_temp = int(re.search("\d\dC",
-                             std_out.decode("utf8")).group().split("C")[0])
+    found = re.search(r"\d\dC", std_out.decode("utf8", "replace"))
+    if found is None:
+        events.count("No GPU temperature from nvidia-smi")
+        return
+    gpu_temp = int(found.group().split("C")[0])
     logging.info('GPU TEMP: ' + str(gpu_temp) + "C")
     RGB = namedtuple('RGB', 'red, green, blue')
     set_static_color(bt, RGB(int(math.floor(1.04 * gpu_temp)),
                              int(math.floor(100 - 1.04 * gpu_temp)), 0))
 
 
+GAMES = ['TslGame.exe', 'starwarsbattlefrontii.exe',
+         'FortniteClient-Win64-Ship', 'RocketLeague.exe', 'Shogun2.exe']
+watcher = ProcessWatcher(GAMES)
+polling = False  # set once watch_games() polls the watcher from a thread
+events = EventCounter()
+# names of the driver states, used by the control socket
+STATES = ['static', 'swap', 'fade', 'phase', 'partition', 'travel',
+          'particles', 'fire', 'plasma', 'breathing']
+
+
+def set_games(games):
+    """[replaces the list of games that switch the strip to gpu_color]
+
+    Arguments:
+        games {[list]} -- [process names]
+    """
+    GAMES[:] = games
+    watcher.set_games(games)
+
+
+def set_palettes(palettes):
+    """[replaces palettes used by the noise effects]
+
+    Arguments:
+        palettes {[dict]} -- [palette name to tuple of colors from RGB class]
+    """
+    noise_tables.PALETTES.update(palettes)
+    # tables are keyed by their colors, only the old palettes go stale
+    noise_tables.palette.cache_clear()
+
+
+def watch_games(bt, interval=1.0):
+    """[polls for games from a thread, interrupting the effect when one starts]
+
+    Arguments:
+        bt {[BlinkyTape]} -- [light controller object]
+        interval {[float]} -- [seconds between scans]
+    """
+    global polling
+    started = threading.Event()
+
+    def changed(running, games):
+        if running:
+            started.set()
+            bt.wake.set()
+
+    def hook(bt):
+        if started.is_set():
+            started.clear()
+            raise EffectInterrupted()
+
+    def loop():
+        while True:
+            watcher.poll()
+            time.sleep(interval)
+
+    watcher.subscribe(changed)
+    bt.frame_hooks.append(hook)
+    polling = True
+    thread = threading.Thread(target=loop)
+    thread.daemon = True
+    thread.start()
+
+
 def game_running():
     """[checks to see if a game is running, return bool]
     """
@@ -188,13 +256,12 @@ def game_running():
         process = Popen("tasklist",
                         shell=True, stdout=PIPE, stderr=PIPE)
         std_out, std_err = process.communicate()
-        games = ['TslGame.exe', 'starwarsbattlefrontii.exe',
-                 'FortniteClient-Win64-Ship', 'RocketLeague.exe', 'Shogun2.exe']
         std_out = std_out.decode('utf8')
-        if any(game in std_out for game in games):
+        if any(game in std_out for game in GAMES):
             return True
-    elif platform.system() == 'Linux':
         return False
+    elif platform.system() == 'Linux':
+        return watcher.running if polling else watcher.poll()
     else:
         return False
 
@@ -208,94 +275,571 @@ def multi_color_parition(bt, collist):
     """
     num_colors = len(collist)
     num_led_per_color = int(bt.get_led_count() / num_colors)
-    for color in collist:
-        for j in range(0, num_led_per_color):
-            bt.sendPixel(color.red, color.green, color.blue)
-    bt.show()
+    frame = segments.new_frame(num_colors * num_led_per_color)
+    for i, color in enumerate(collist):
+        segments.fill_range(frame, i * num_led_per_color,
+                            (i + 1) * num_led_per_color, color)
+    bt.send_frame(frame)
 
 
-def travel_up(bt, col1, col2, block_size=0, exp=False, time_delay=0.1):
-     """[makes a block of leds that move along strip]
+def travel_up(bt, col1, col2, block_size=0, exp=False, speed=10, freq=60):
+    """[makes a block of leds that move along strip]
 
     Arguments:
         col1 {[RGB]} -- [color from RGB class]
         col2 {[RGB]} -- [color from RGB class]
         block_size {[int]} -- [number of leds in a block]
-        exp {[bool]} -- [uses exponent delay model for block movement]
-        time_delay {[float]} -- [delay in bettween each block movement]
+        exp {[bool]} -- [block speeds up by 10% every LED it moves]
+        speed {[float]} -- [LEDs per second, at the start if exp]
+        freq {[float]} -- [highest frames per second]
         bt {[BlinkyTape]} -- [light controller object]
     """
+    led_count = bt.get_led_count()
+    growth = math.log(1.1)
+    if exp:
+        # solves dx/dt = speed * 1.1 ** x for the time to reach led_count
+        duration = (1 - 1.1 ** -led_count) / (speed * growth)
+    else:
+        duration = led_count / speed
     set_static_color(bt, col1)
-    for i in range(0, bt.get_led_count()):
-        for j in range(0, bt.get_led_count()):
-            if i <= j <= i + block_size:
-                bt.sendPixel(col2.red, col2.green, col2.blue)
-            else:
-                bt.sendPixel(col1.red, col1.green, col1.blue)
-        bt.show()
+    frame = segments.new_frame(led_count)
+    shown = None
+    for t in frame_times(bt, freq, duration):
         if exp:
-            time_delay = time_delay / 1.1
-            time.sleep(time_delay)
+            position = -math.log(1 - speed * growth * t) / growth
         else:
-            time.sleep(time_delay)
+            position = speed * t
+        position = min(int(position), led_count - 1)
+        if position != shown:
+            segments.moving_block(frame, position, block_size + 1, col2, col1)
+            bt.send_frame(frame)
+            shown = position
+
+
+def particle_bursts(bt, col1, col2, freq=60, duration=10, rate=3, rng=random):
+    """[sparks bursting from random points and fading along the strip]
+
+    Arguments:
+        col1 {[RGB]} -- [color from RGB class]
+        col2 {[RGB]} -- [color from RGB class]
+        freq {[float]} -- [frames per second]
+        duration {[int]} -- [length effect occurs]
+        rate {[float]} -- [average bursts per second]
+        rng {[Random]} -- [source of the random choices]
+        bt {[BlinkyTape]} -- [light controller object]
+    """
+    led_count = bt.get_led_count()
+    system = ParticleSystem(
+        led_count, rng=np.random.RandomState(rng.getrandbits(32)))
+    last = 0.0
+    for t in frame_times(bt, freq, duration):
+        if rng.random() < rate * (t - last):
+            system.spawn(60, rng.uniform(0, led_count), led_count / 2,
+                         col1, col2, life=1.5, spread=1)
+        system.step(t - last, drag=1.5)
+        last = t
+        bt.send_frame(system.render(trail=0.5))
+
+
+def fire(bt, freq=60, duration=10, speed=40):
+    """[flickering fire, hottest at the start of the strip]
+
+    Arguments:
+        freq {[float]} -- [frames per second]
+        duration {[int]} -- [length effect occurs]
+        speed {[float]} -- [noise table rows scrolled per second]
+        bt {[BlinkyTape]} -- [light controller object]
+    """
+    table = noise_tables.noise_2d()
+    size = table.shape[0]
+    cols = np.arange(bt.get_led_count()) * 2 % size
+    heat = np.linspace(1.0, 0.4, bt.get_led_count())
+    for t in frame_times(bt, freq, duration):
+        row = table[int(t * speed) % size]
+        # looked up every frame so config palette changes show right away
+        lut = noise_tables.palette(noise_tables.PALETTES['fire'])
+        bt.send_frame(lut[noise_tables.lut_index(row[cols] * heat)])
+
+
+def plasma(bt, freq=60, duration=10, speed=20):
+    """[slowly drifting plasma from two crossing noise samples]
+
+    Arguments:
+        freq {[float]} -- [frames per second]
+        duration {[int]} -- [length effect occurs]
+        speed {[float]} -- [noise table cells scrolled per second]
+        bt {[BlinkyTape]} -- [light controller object]
+    """
+    table = noise_tables.noise_2d()
+    size = table.shape[0]
+    cols = np.arange(bt.get_led_count()) % size
+    for t in frame_times(bt, freq, duration):
+        shift = int(t * speed)
+        values = table[shift % size, cols] + table[cols, (2 * shift) % size]
+        lut = noise_tables.palette(noise_tables.PALETTES['plasma'])
+        bt.send_frame(lut[noise_tables.lut_index(values / 2)])
+
+
+def breathing(bt, col, freq=60, duration=10, speed=60):
+    """[one color with its brightness drifting along 1D noise]
+
+    Arguments:
+        col {[RGB]} -- [color from RGB class]
+        freq {[float]} -- [frames per second]
+        duration {[int]} -- [length effect occurs]
+        speed {[float]} -- [noise table entries stepped per second]
+        bt {[BlinkyTape]} -- [light controller object]
+    """
+    table = noise_tables.noise_1d()
+    base = segments.fill_range(segments.new_frame(bt.get_led_count()), 0,
+                               bt.get_led_count(), col).astype(np.float32)
+    for t in frame_times(bt, freq, duration):
+        level = 0.15 + 0.85 * table[int(t * speed) % len(table)]
+        bt.send_frame((base * level).astype(np.uint8))
+
 
+def audio_spectrum(bt, col1, col2, blocks, sample_rate, realtime=False):
+    """[spectrum analyzer with one log spaced band per LED]
 
-def driver(bt):
+    Arguments:
+        col1 {[RGB]} -- [color of quiet bands]
+        col2 {[RGB]} -- [color of loud bands]
+        blocks {[iterable]} -- [mono sample blocks from audio.wav_blocks or
+                                audio.pcm_blocks, one frame period long]
+        sample_rate {[int]} -- [samples per second]
+        realtime {[bool]} -- [waits out each block, for files instead of
+                              live streams]
+        bt {[BlinkyTape]} -- [light controller object]
+    """
+    analyzer = SpectrumAnalyzer(bt.get_led_count(), sample_rate)
+    lut = gradients.gradient((RGB.BLACK, col1, col2))
+    for block in blocks:
+        levels = analyzer.process(block)
+        levels = np.maximum(levels, 0.6 * analyzer.peak)
+        bt.send_frame(lut[noise_tables.lut_index(levels)])
+        if realtime:
+            bt.sleep(len(block) / sample_rate)
+
+
+def play_show(bt, path, start=0):
+    """[plays a show file recorded with show_file]
+
+    Frames are picked by the clock, so a slow host skips frames instead
+    of slowing the show down.
+
+    Arguments:
+        path {[string]} -- [show file]
+        start {[float]} -- [seconds into the show to start at]
+        bt {[BlinkyTape]} -- [light controller object]
+    """
+    with ShowReader(path) as show:
+        for t in frame_times(bt, show.fps, show.duration - start):
+            bt.send_frame(show.at(start + t))
+
+
+def play_timeline(bt, path, freq=60, duration=None):
+    """[plays a keyframe timeline file, see timeline.py]
+
+    Arguments:
+        path {[string]} -- [JSON timeline]
+        freq {[float]} -- [frames per second]
+        duration {[float]} -- [seconds to play, defaults to the timeline's
+                               length, or 60 if it loops]
+        bt {[BlinkyTape]} -- [light controller object]
+    """
+    show = timeline.load(path, bt.get_led_count())
+    if duration is None:
+        duration = 60 if show.loop else show.duration
+    for t in frame_times(bt, freq, duration):
+        bt.send_frame(show.frame(t))
+
+
+def driver(bt, control=None, rng=random, game_check=game_running, effect=None,
+           fps=None, weights=None):
     """[driver used to control different effects]
 
     Arguments:
         bt {[BlinkyTape]} -- [light controller object]
+        control {[ControlServer]} -- [runs requested effects before random ones]
+        rng {[Random]} -- [source of the random choices, seed for replay]
+        game_check {[function]} -- [returns True while a game is running]
+        effect {[string]} -- [name from STATES to run instead of a random one]
+        fps {[float]} -- [frame rate of the animated effects, defaults to
+                          each effect's own]
+        weights {[dict]} -- [relative odds of random effects by name,
+                             missing names get 0, None picks evenly]
+
+    Returns:
+        [string] -- [name of the effect that ran, 'gpu' during games]
     """
-    if game_running():
-        gpu_color(bt)
+    rate = {'freq': fps} if fps else {}
+    if game_check():
+        try:
+            gpu_color(bt)
+            # the temperature changes slowly, no need to run nvidia-smi
+            # back to back
+            bt.sleep(5)
+        except EffectInterrupted:
+            # the requested effect runs once the game is gone
+            logging.debug('Interrupted gpu')
+        return 'gpu'
     else:
-        # 6 different states for random vars for things to do
-        state = random.randint(0, 5) 
-        col1 = RGB.colors[list(RGB.colors.keys())[random.randint(0, 305)]]
-        col2 = RGB.colors[list(RGB.colors.keys())[random.randint(0, 305)]]
+        # different states for random vars for things to do
+        name = control.next_effect() if control else None
+        name = name or effect
+        if name in STATES:
+            state = STATES.index(name)
+        elif weights:
+            state = rng.choices(range(len(STATES)),
+                                [weights.get(s, 0) for s in STATES])[0]
+        else:
+            state = rng.randint(0, len(STATES) - 1)
+        if control:
+            control.current = STATES[state]
+        col1 = RGB.colors[list(RGB.colors.keys())[rng.randint(0, 305)]]
+        col2 = RGB.colors[list(RGB.colors.keys())[rng.randint(0, 305)]]
         while math.sqrt(pow(col2.red-col1.red,2)+pow(col2.green-col1.green,2)+pow(col2.blue-col2.blue,2)) < 80:
-            col2 = RGB.colors[list(RGB.colors.keys())[random.randint(0, 305)]]
-        print(col1)
-        print(col2)
+            col2 = RGB.colors[list(RGB.colors.keys())[rng.randint(0, 305)]]
+        logging.debug('Colors: ' + str(col1) + ', ' + str(col2))
         try:
             if state == 0:
                 logging.debug('0')
-                set_static_color(bt, col)
-                time.sleep(60)
+                set_static_color(bt, col1)
+                bt.sleep(60)
             elif state == 1:
                 logging.debug('1')
-                two_color_swap(bt, col1, col2, freq=random.choice([2, 3, 5]), duration=10)
+                two_color_swap(bt, col1, col2, freq=rng.choice([2, 3, 5]), duration=10)
             elif state == 2:
                 logging.debug('2')
-                color_fade(bt, col1, col2, duration=100)
+                color_fade(bt, col1, col2, duration=100, **rate)
             elif state == 3:
                 logging.debug('3')
-                color_phase(bt, freq=random.choice([5, 10, 15, 20, 35, 50, 66, 80, 90, 100, 120, 150, 170, 200, 250, 400, 500]), duration=100)
+                # the old 5 degree steps at these frame rates, in degrees/sec
+                color_phase(bt, speed=5 * rng.choice([5, 10, 15, 20, 35, 50, 66, 80, 90, 100, 120, 150, 170, 200, 250, 400, 500]), duration=100, **rate)
             elif state == 4:
                 logging.debug('4')
                 multi_color_parition(bt, [col1, col2])
-                time.sleep(60)
+                bt.sleep(60)
             elif state == 5:
                 logging.debug('5')
                 for i in range(0, 10):
-                    travel_up(bt, col1, col2, block_size=random.randint(0, 5), exp=random.choice(
-                        [True, False]), time_delay=random.uniform(0.5, 2))
-        except:
+                    travel_up(bt, col1, col2, block_size=rng.randint(0, 5), exp=rng.choice(
+                        [True, False]), speed=1 / rng.uniform(0.5, 2), **rate)
+            elif state == 6:
+                logging.debug('6')
+                particle_bursts(bt, col1, col2, duration=60, rng=rng, **rate)
+            elif state == 7:
+                logging.debug('7')
+                fire(bt, duration=60, **rate)
+            elif state == 8:
+                logging.debug('8')
+                plasma(bt, duration=60, **rate)
+            elif state == 9:
+                logging.debug('9')
+                breathing(bt, col1, duration=60, **rate)
+        except EffectInterrupted:
+            logging.debug('Interrupted state ' + str(state))
+        except Exception:
             logging.debug('State error from ' + str(state))
             print("Unexpected error:" + str(sys.exc_info()[0]))
+        return STATES[state]
+
+
+def simulate(duration, seed=0, led_count=60, start=None, record=False):
+    """[runs driver() on a virtual clock as fast as frames can be computed]
+
+    The same seed always produces the same frame stream, compare the
+    digest of the returned tape to check a run.
+
+    Arguments:
+        duration {[float]} -- [simulated seconds, ex: 86400 for a day]
+        seed {[int]} -- [random seed]
+        led_count {[int]} -- [number of LEDs]
+        start {[datetime]} -- [simulated start time, defaults to noon]
+        record {[bool]} -- [keeps every frame on the tape]
+
+    Returns:
+        [HeadlessTape] -- [tape with frame count and digest]
+    """
+    clock = VirtualClock(start) if start else VirtualClock()
+    tape = HeadlessTape(led_count, always_on=False, record=record, clock=clock)
+    rng = random.Random(seed)
+    while clock.elapsed < duration:
+        driver(tape, rng=rng, game_check=lambda: False)
+    return tape
+
+
+def watch_config(path, bt, limiter=None):
+    """[loads a config file and applies it to bt and the effects on change]
 
+    Arguments:
+        path {[string]} -- [JSON config file]
+        bt {[BlinkyTape]} -- [light controller object]
+        limiter {[PowerLimiter]} -- [stage taking the power_budget section]
+
+    Returns:
+        [ConfigWatcher] -- [current values, ex: weights for driver()]
+    """
+    config = ConfigWatcher(path, bt, effects=STATES)
+    config.subscribe('hours', lambda hours: setattr(bt, 'hours', hours))
+    config.subscribe('brightness', bt.set_brightness)
+    config.subscribe('games', set_games)
+    config.subscribe('palettes', set_palettes)
+    if limiter is not None:
+        config.subscribe('power_budget',
+                         lambda budget: setattr(limiter, 'budget_ma', budget))
+    return config.start()
+
+
+def add_stages(bt, power_budget=None):
+    """[adds the output stages used on the real strip]
+
+    Arguments:
+        bt {[BlinkyTape]} -- [light controller object]
+        power_budget {[float]} -- [current limit in mA, None for no limit]
 
-def main():
+    Returns:
+        [PowerLimiter] -- [the limiter stage, to change its budget later]
+    """
+    limiter = PowerLimiter(power_budget)
+    bt.stages.append(limiter)
+    bt.stages.append(TemporalDither(bt.get_led_count()))
+    return limiter
+
+
+def host_port(text):
+    """[parses a HOST:PORT command line value]
+
+    Returns:
+        [tuple] -- [(host, port)]
+    """
+    host, _, port = text.rpartition(':')
+    try:
+        return (host or '127.0.0.1', int(port))
+    except ValueError:
+        raise argparse.ArgumentTypeError('expected HOST:PORT, got ' + text)
+
+
+def parse_args(argv=None):
+    """[parses the command line of lights.py]
+
+    Arguments:
+        argv {[list]} -- [arguments, defaults to sys.argv[1:]]
+
+    Returns:
+        [Namespace] -- [parsed options]
+    """
+    parser = argparse.ArgumentParser(
+        description='Runs the light show on a BlinkyTape.')
+    parser.add_argument('-p', '--port',
+                        help='serial port, defaults to the first BlinkyTape '
+                        'found (waits for one to be plugged in)')
+    parser.add_argument('-n', '--leds', type=int, default=60,
+                        help='number of LEDs (default: %(default)s)')
+    parser.add_argument('-b', '--baud', type=int, default=115200,
+                        help='serial speed (default: %(default)s)')
+    parser.add_argument('-e', '--effect', action='append', default=[],
+                        choices=STATES, metavar='NAME',
+                        help='effect to run, repeat for a playlist played '
+                        'in order, defaults to random effects. One of: ' +
+                        ', '.join(STATES))
+    parser.add_argument('--play', action='append', default=[],
+                        metavar='SHOW',
+                        help='show file, or .json keyframe timeline, to '
+                        'play instead of the effects, repeat for a playlist '
+                        'played in order')
+    parser.add_argument('--fps', type=float,
+                        help='frame rate of the animated effects, defaults '
+                        "to each effect's own")
+    parser.add_argument('--power-budget', type=float, metavar='MA',
+                        help='scales frames down to stay within this many '
+                        'mA, ex: 500 on a USB port, defaults to no limit')
+    parser.add_argument('-c', '--config',
+                        help='JSON file with hours, brightness, games, '
+                        'palettes and effect weights, reloaded when it '
+                        'changes (see config.py)')
+    parser.add_argument('--control', default=SOCKET_PATH, metavar='PATH',
+                        help='unix socket taking control commands, give '
+                        'each instance on a host its own (default: '
+                        '%(default)s, 127.0.0.1:7890 over TCP on Windows)')
+    parser.add_argument('--metrics', type=host_port, metavar='HOST:PORT',
+                        default=METRICS_ADDRESS,
+                        help='address serving Prometheus metrics, give each '
+                        'instance on a host its own (default: %s:%d)'
+                        % METRICS_ADDRESS)
+    parser.add_argument('--log-level', default='DEBUG',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='(default: %(default)s)')
+    parser.add_argument('--log-file', default='lights.log',
+                        help='(default: %(default)s)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='runs in real time on a simulated strip '
+                        'without opening a port or the control sockets')
+    parser.add_argument('--profile', nargs='?', const='', metavar='PREFIX',
+                        help='profiles each effect with cProfile, prints '
+                        'the hottest functions on exit and writes '
+                        'PREFIX<effect>.prof files if PREFIX is given')
+    parser.add_argument('--bench', action='store_true',
+                        help='renders every selected effect once on a '
+                        'virtual clock and prints frames per second')
+    return parser.parse_args(argv)
+
+
+def profiled(profiles, *args, **kwargs):
+    """[runs driver() under cProfile and files the result by effect]
+
+    Arguments:
+        profiles {[dict]} -- [effect name to pstats.Stats, updated in place]
+
+    Returns:
+        [string] -- [name of the effect that ran]
+    """
+    profile = cProfile.Profile()
+    # an effect cut short by Ctrl-C is filed under the effect requested
+    name = kwargs.get('effect') or 'interrupted'
+    try:
+        name = profile.runcall(driver, *args, **kwargs)
+    finally:
+        _add_profile(profiles, name, profile)
+    return name
+
+
+def _add_profile(profiles, name, profile):
+    if name in profiles:
+        profiles[name].add(profile)
+    else:
+        profiles[name] = pstats.Stats(profile, stream=sys.stderr)
+
+
+def report_profiles(profiles, prefix=None):
+    """[prints, and optionally saves, the per effect profiles]
+
+    Arguments:
+        profiles {[dict]} -- [effect name to pstats.Stats]
+        prefix {[string]} -- [path prefix of the .prof files, empty skips them]
+    """
+    for name, stats in sorted(profiles.items()):
+        sys.stderr.write('\n==== %s ====\n' % name)
+        stats.sort_stats('cumulative').print_stats(15)
+        if prefix:
+            stats.dump_stats('%s%s.prof' % (prefix, name))
+
+
+def check_stages(led_count=60, power_budget=None):
+    """[sends a bytes frame dimmed by the brightness through the strip stages]
+
+    Frames from displayColor, DDP and refresh() reach the stages as bytes,
+    which send_frame has to turn into (n, 3) pixels before dimming them.
+
+    Arguments:
+        led_count {[int]} -- [number of LEDs]
+        power_budget {[float]} -- [current limit in mA, None for no limit]
+
+    Raises:
+        RuntimeError -- [the strip would not show the dimmed frame]
+    """
+    tape = HeadlessTape(led_count)
+    add_stages(tape, power_budget)
+    tape.set_brightness(100)
+    tape.displayColor(200, 100, 0)
+    shown = tape.frames[-1].astype(int)
+    limited = tape.stages[0].stats['limited']
+    if shown.shape != (led_count, 3) or not limited and \
+            np.abs(shown - [200 * 100 / 255.0, 100 * 100 / 255.0, 0]).max() > 1:
+        raise RuntimeError('Output stages mangled a dimmed bytes frame')
+
+
+def bench(args, profiles=None):
+    """[renders each effect on a virtual clock and prints its frame rate]
+
+    Output stages are the same as on the strip, so the numbers are the
+    frames per second the host can compute, not what the serial port
+    carries.
+
+    Arguments:
+        args {[Namespace]} -- [options from parse_args]
+        profiles {[dict]} -- [effect name to pstats.Stats, None to skip]
+    """
+    check_stages(args.leds, args.power_budget)
+    print('%-10s %8s %8s %10s %9s' % ('effect', 'frames', 'seconds',
+                                      'fps', 'realtime'))
+    for name in args.effect or STATES:
+        tape = HeadlessTape(args.leds, record=False)
+        add_stages(tape, args.power_budget)
+        run = driver if profiles is None else \
+            functools.partial(profiled, profiles)
+        start = timeit.default_timer()
+        run(tape, rng=random.Random(0), game_check=lambda: False,
+            effect=name, fps=args.fps)
+        wall = timeit.default_timer() - start
+        print('%-10s %8d %8.2f %10.1f %8.1fx' % (
+            name, tape.frame_count, wall, tape.frame_count / max(wall, 1e-9),
+            tape.clock.elapsed / max(wall, 1e-9)))
+
+
+def main(argv=None):
     """[Main function to run custom light program]
+
+    Arguments:
+        argv {[list]} -- [command line arguments, see parse_args]
     """
-    logging.basicConfig(filename='lights.log',
-                        format='%(asctime)s %(message)s', level=logging.DEBUG)
-    logging.getLogger().addHandler(logging.StreamHandler())
-    logging.debug('Begining to Run Program')
-    usb_devices = find_usb_dev()
-    bt = BlinkyTape(usb_devices)
-    while True:
-        driver(bt)
+    args = parse_args(argv)
+    listener = setup_logging(args.log_file, getattr(logging, args.log_level))
+    profiles = {} if args.profile is not None else None
+    try:
+        if args.bench:
+            bench(args, profiles)
+            return
+        logging.debug('Begining to Run Program')
+        control = None
+        if args.dry_run:
+            bt = HeadlessTape(args.leds, record=False, clock=SystemClock())
+        else:
+            usb_devices, finder = args.port, None
+            if not usb_devices:
+                # reconnects only look for ports with BlinkyTape ids
+                usb_devices, finder = find_usb_dev(), find_usb_dev
+            if not usb_devices:
+                # an unknown port is reopened by name, never searched for
+                usb_devices, finder = find_usb_dev(fallback=True), None
+            if not usb_devices:
+                usb_devices, finder = devices.wait_for_device(), find_usb_dev
+            bt = BlinkyTape(usb_devices, args.leds, reconnect=True,
+                            finder=finder, baudrate=args.baud)
+            address = args.control if hasattr(socket, 'AF_UNIX') else None
+            control = ControlServer(bt, address, effects=STATES)
+            Metrics(bt, control, watcher).serve(args.metrics)
+            if platform.system() == 'Linux':
+                watch_games(bt)
+        limiter = add_stages(bt, args.power_budget)
+        config = None
+        if args.config:
+            config = watch_config(args.config, bt, limiter)
+        run = driver if profiles is None else \
+            functools.partial(profiled, profiles)
+        rate = {'freq': args.fps} if args.fps else {}
+        if args.play:
+            for path in itertools.cycle(args.play):
+                try:
+                    if path.endswith('.json'):
+                        play_timeline(bt, path, **rate)
+                    else:
+                        play_show(bt, path)
+                except EffectInterrupted:
+                    logging.debug('Interrupted show ' + path)
+        playlist = itertools.cycle(args.effect or [None])
+        while True:
+            weights = config.get('weights') if config else None
+            run(bt, control, effect=next(playlist), fps=args.fps,
+                weights=weights)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if profiles:
+            report_profiles(profiles, args.profile)
+        # log the pending event counts and drain the queue before exiting
+        events.flush()
+        listener.stop()
 
 
 if __name__ == '__main__':
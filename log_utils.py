@@ -0,0 +1,64 @@
+"""
+Logging setup that keeps file and terminal I/O off the frame loop.
+"""
+import time
+import logging
+import logging.handlers
+import queue
+from collections import Counter
+
+
+def setup_logging(filename='lights.log', level=logging.DEBUG):
+    """[routes the root logger through a queue drained by a listener thread]
+
+    Arguments:
+        filename {[string]} -- [log file]
+        level {[int]} -- [root logger level]
+
+    Returns:
+        [QueueListener] -- [started listener, stop() flushes the handlers]
+    """
+    file_handler = logging.FileHandler(filename)
+    file_handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    records = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(
+        records, file_handler, logging.StreamHandler())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    listener.start()
+    return listener
+
+
+class EventCounter(object):
+    def __init__(self, interval=10, level=logging.DEBUG):
+        """[aggregates hot path log events into one record per interval]
+
+        Arguments:
+            interval {[float]} -- [seconds between summary records]
+            level {[int]} -- [level of the summary records]
+        """
+        self.interval = interval
+        self.level = level
+        self.counts = Counter()
+        self.last = time.time()
+
+    def count(self, event):
+        """[counts one occurrence of event]
+
+        Arguments:
+            event {[string]} -- [constant message, no per call formatting]
+        """
+        self.counts[event] += 1
+        if time.time() - self.last >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """[logs and resets the counts]"""
+        if self.counts and logging.getLogger().isEnabledFor(self.level):
+            logging.log(self.level, '%d events in %.0fs: %s',
+                        sum(self.counts.values()), time.time() - self.last,
+                        ', '.join('%s x%d' % item
+                                  for item in sorted(self.counts.items())))
+        self.counts.clear()
+        self.last = time.time()
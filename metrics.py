@@ -0,0 +1,157 @@
+"""
+Frame loop health metrics, exported as Prometheus text over localhost HTTP
+or written periodically to a stats file.
+"""
+import os
+import time
+import json
+import logging
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+METRICS_ADDRESS = ('127.0.0.1', 9101)
+
+
+class Metrics(object):
+    def __init__(self, bt, control=None, watcher=None, smoothing=0.1):
+        """[collects counters and gauges from a BlinkyTape frame loop]
+
+        Arguments:
+            bt {[BlinkyTape]} -- [light controller object]
+            control {[ControlServer]} -- [source of the current effect]
+            watcher {[ProcessWatcher]} -- [source of the game state]
+            smoothing {[float]} -- [weight of the newest frame in the fps average]
+        """
+        self.bt = bt
+        self.control = control
+        self.watcher = watcher
+        self.smoothing = smoothing
+        self.frame_interval = 0.0
+        self.frames = 0
+        self.last_frame_time = None
+        bt.frame_hooks.append(self.hook)
+
+    def hook(self, bt):
+        """[frame hook tracking the achieved frame rate]"""
+        now = time.time()
+        frames = bt.stats['frames'] + bt.stats['skipped']
+        if frames == self.frames:
+            return  # woken from sleep, not a new frame
+        if self.last_frame_time is not None:
+            interval = (now - self.last_frame_time) / (frames - self.frames)
+            self.frame_interval += self.smoothing * \
+                (interval - self.frame_interval)
+        self.frames = frames
+        self.last_frame_time = now
+
+    def snapshot(self):
+        """[returns the current metric values]
+
+        Returns:
+            [dict] -- [metric name -> value, strings for labels]
+        """
+        now = time.time()
+        idle = now - self.last_frame_time if self.last_frame_time else 0.0
+        # a stalled loop stops calling the hook, so fall back on the idle time
+        interval = max(self.frame_interval, idle)
+        if self.bt.override:
+            schedule = 'override'
+        elif self.bt.active():
+            schedule = 'on'
+        else:
+            schedule = 'off'
+        return {
+            'frames_sent': self.bt.stats['frames'],
+            'frames_skipped': self.bt.stats['skipped'],
+            'frames_dropped': self.bt.stats['dropped'],
+            'bytes_written': self.bt.stats['bytes'],
+            'serial_errors': self.bt.stats['serial_errors'],
+            'reconnects': self.bt.reconnects,
+            'fps': 1.0 / interval if interval > 0 else 0.0,
+            'seconds_since_frame': idle,
+            'brightness': self.bt.brightness,
+            'game_running': int(bool(self.watcher and self.watcher.running)),
+            'effect': (self.control and self.control.current) or 'none',
+            'schedule': schedule,
+        }
+
+    def prometheus(self):
+        """[formats the snapshot in the Prometheus text format]"""
+        values = self.snapshot()
+        port = self.bt.port
+        lines = []
+        for name in ('frames_sent', 'frames_skipped', 'frames_dropped',
+                     'bytes_written', 'serial_errors', 'reconnects'):
+            lines.append('# TYPE blinkytape_%s_total counter' % name)
+            lines.append('blinkytape_%s_total{port="%s"} %d' %
+                         (name, port, values[name]))
+        for name in ('fps', 'seconds_since_frame', 'brightness',
+                     'game_running'):
+            lines.append('# TYPE blinkytape_%s gauge' % name)
+            lines.append('blinkytape_%s{port="%s"} %g' %
+                         (name, port, values[name]))
+        for name in ('effect', 'schedule'):
+            lines.append('# TYPE blinkytape_%s gauge' % name)
+            lines.append('blinkytape_%s{port="%s",%s="%s"} 1' %
+                         (name, port, name, values[name]))
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, address=METRICS_ADDRESS):
+        """[serves /metrics over HTTP from a background thread]
+
+        An address already taken, ex: by another instance on the host, is
+        logged and the show runs on without metrics.
+
+        Arguments:
+            address {[tuple]} -- [(host, port) to listen on]
+
+        Returns:
+            [HTTPServer] -- [running server, shutdown() stops it, or None
+                             if the address could not be bound]
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus().encode('utf8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            server = HTTPServer(address, Handler)
+        except OSError as e:
+            logging.warning('Metrics not served on %s:%d: %s'
+                            % (address[0], address[1], e))
+            return None
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return server
+
+    def write_file(self, path, interval=10):
+        """[writes the snapshot as JSON to path every interval seconds]
+
+        The file is replaced atomically so readers never see half of it.
+        """
+        def loop():
+            while True:
+                tmp = path + '.tmp'
+                with open(tmp, 'w') as f:
+                    json.dump(self.snapshot(), f)
+                os.replace(tmp, path)
+                time.sleep(interval)
+
+        thread = threading.Thread(target=loop)
+        thread.daemon = True
+        thread.start()
+        return thread
@@ -0,0 +1,140 @@
+"""
+One logical LED canvas spread over several BlinkyTapes on separate ports.
+"""
+import threading
+import time
+import logging
+import queue
+import numpy as np
+
+
+class MultiTape(object):
+    def __init__(self, tapes):
+        """[maps a canvas onto tapes in order, one writer thread per port]
+
+        Arguments:
+            tapes {[list]} -- [BlinkyTape objects, first one starts at LED 0]
+        """
+        self.tapes = list(tapes)
+        self.clock = self.tapes[0].clock
+        self.frame_hooks = []  # called with this object after every frame
+        self.stages = []  # functions applied to whole canvas frames
+        self.wake = threading.Event()
+        self.stats = {'dropped': 0}  # frames dropped by effects running late
+        self.ledCount = sum(t.get_led_count() for t in self.tapes)
+        self.bounds = []
+        start = 0
+        for t in self.tapes:
+            self.bounds.append((start, start + 3 * t.get_led_count()))
+            start += 3 * t.get_led_count()
+        self.buf = bytearray()
+        self.skew = 0.0  # seconds between first and last show of a frame
+        self.max_skew = 0.0
+        self.shown_at = [0.0] * len(self.tapes)
+        self.errors = [None] * len(self.tapes)
+        self.results = [1] * len(self.tapes)
+        self.ready = threading.Barrier(len(self.tapes))
+        self.done = threading.Barrier(len(self.tapes) + 1)
+        self.queues = [queue.Queue(1) for _ in self.tapes]
+        for i in range(len(self.tapes)):
+            worker = threading.Thread(target=self._worker, args=(i,))
+            worker.daemon = True
+            worker.start()
+
+    def _worker(self, i):
+        """[writes segments for tape i, showing in step with the others]"""
+        tape = self.tapes[i]
+        while True:
+            segment = self.queues[i].get()
+            try:
+                self.results[i] = tape.send_frame(segment, show=False)
+                # Only the one byte show commands are left after this
+                self.ready.wait()
+                tape.show()
+                self.shown_at[i] = time.time()
+            except Exception as e:
+                self.errors[i] = e
+                self.ready.abort()
+            try:
+                self.done.wait()
+            except threading.BrokenBarrierError:
+                pass
+
+    def get_led_count(self):
+        return self.ledCount
+
+    def send_frame(self, frame):
+        """[splits a frame across the tapes and shows it on all of them]
+
+        Frames go through [stages] first, float arrays left after that
+        are rounded, as in BlinkyTape.send_frame.
+
+        Arguments:
+            frame {[bytes]} -- [RGB pixel data, or a NumPy array]
+        """
+        for stage in self.stages:
+            frame = stage(frame)
+        if getattr(frame, 'dtype', None) is not None:
+            if frame.dtype.kind == 'f':
+                frame = (frame + 0.5).clip(0, 255)
+            frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        data = memoryview(frame).cast('B')
+        if len(data) > 3 * self.ledCount:
+            raise RuntimeError("Attempting to set pixel outside range!")
+        for q, (start, stop) in zip(self.queues, self.bounds):
+            q.put(data[start:stop])
+        self.done.wait()
+        # Tapes that only saw the aborted barrier are listed last
+        errors = sorted((e for e in self.errors if e is not None),
+                        key=lambda e: isinstance(e, threading.BrokenBarrierError))
+        if errors:
+            self.errors = [None] * len(self.tapes)
+            self.ready.reset()
+            raise errors[0]
+        self.skew = max(self.shown_at) - min(self.shown_at)
+        if self.skew > self.max_skew:
+            self.max_skew = self.skew
+            logging.debug('Inter-device skew: %.6fs' % self.skew)
+        self.buf = bytearray()
+        self._frame_done()
+        return min(self.results)
+
+    def sendPixel(self, r, g, b):
+        """[buffers one pixel, sent to the tapes on show]"""
+        if len(self.buf) >= 3 * self.ledCount:
+            raise RuntimeError("Attempting to set pixel outside range!")
+        self.buf += bytearray([min(r, 254), min(g, 254), min(b, 254)])
+
+    def show(self):
+        """[shows the buffered pixels]"""
+        self.send_frame(self.buf)
+
+    def displayColor(self, r, g, b):
+        """[fills the whole canvas with one color]"""
+        pixel = bytearray([min(r, 255), min(g, 255), min(b, 255)])
+        return self.send_frame(pixel * self.ledCount)
+
+    def sleep(self, seconds):
+        """[waits between frames, see BlinkyTape.sleep]"""
+        deadline = self.clock.time() + seconds
+        while True:
+            remaining = deadline - self.clock.time()
+            if remaining <= 0:
+                return
+            if self.clock.wait(self.wake, remaining):
+                self.wake.clear()
+                self._frame_done()
+
+    def _frame_done(self):
+        """[runs the frame hooks at a frame boundary]"""
+        for hook in list(self.frame_hooks):
+            hook(self)
+
+    def set_override(self, val, timeout=30):
+        for t in self.tapes:
+            t.set_override(val, timeout)
+
+    def close(self):
+        """[closes every tape]"""
+        for t in self.tapes:
+            t.close()
@@ -0,0 +1,120 @@
+"""
+Precomputed tileable gradient noise tables and palette lookup tables.
+
+Tables are built once and cached, so noise effects only index into them
+each frame instead of evaluating noise per pixel.
+"""
+import numpy as np
+from functools import lru_cache
+from color_constants import RGB
+
+FIRE = (RGB.BLACK, RGB.RED3, RGB.ORANGERED1, RGB.DARKORANGE, RGB.GOLD1,
+        RGB.YELLOW1)
+PLASMA = (RGB.NAVY, RGB.PURPLE, RGB.DEEPPINK1, RGB.ORANGE, RGB.SPRINGGREEN,
+          RGB.TURQUOISE, RGB.BLUE, RGB.NAVY)
+# palettes looked up by the effects, replaced by the config file
+PALETTES = {'fire': FIRE, 'plasma': PLASMA}
+
+
+def _fade(t):
+    """[quintic smoothstep used to blend lattice gradients]"""
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+
+def _normalize(values):
+    """[scales values to 0-1 as float32]"""
+    values = values - values.min()
+    return (values / max(values.max(), 1e-9)).astype(np.float32)
+
+
+@lru_cache(maxsize=None)
+def noise_1d(size=1024, cells=16, octaves=3, seed=0):
+    """[tileable 1D gradient noise]
+
+    Arguments:
+        size {[int]} -- [table length, the table wraps around]
+        cells {[int]} -- [lattice cells of the first octave]
+        octaves {[int]} -- [octaves summed, each twice the frequency]
+        seed {[int]} -- [random seed of the gradients]
+
+    Returns:
+        [array] -- [read only float32 table of values in 0-1]
+    """
+    rng = np.random.RandomState(seed)
+    x = np.arange(size, dtype=np.float64)
+    total = np.zeros(size)
+    for octave in range(octaves):
+        period = cells << octave
+        grads = rng.uniform(-1, 1, period)
+        p = x * period / size
+        i = np.floor(p).astype(np.intp)
+        f = p - i
+        a = grads[i % period] * f
+        b = grads[(i + 1) % period] * (f - 1)
+        total += (a + _fade(f) * (b - a)) / (1 << octave)
+    table = _normalize(total)
+    table.flags.writeable = False
+    return table
+
+
+@lru_cache(maxsize=None)
+def noise_2d(size=256, cells=8, octaves=3, seed=0):
+    """[tileable 2D gradient noise]
+
+    Arguments:
+        size {[int]} -- [table width and height, the table wraps around]
+        cells {[int]} -- [lattice cells per side of the first octave]
+        octaves {[int]} -- [octaves summed, each twice the frequency]
+        seed {[int]} -- [random seed of the gradients]
+
+    Returns:
+        [array] -- [read only (size, size) float32 table of values in 0-1]
+    """
+    rng = np.random.RandomState(seed)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float64)
+    total = np.zeros((size, size))
+    for octave in range(octaves):
+        period = cells << octave
+        angles = rng.uniform(0, 2 * np.pi, (period, period))
+        gx, gy = np.cos(angles), np.sin(angles)
+        px, py = x * period / size, y * period / size
+        ix, iy = np.floor(px).astype(np.intp), np.floor(py).astype(np.intp)
+        fx, fy = px - ix, py - iy
+        corners = []
+        for dy in (0, 1):
+            for dx in (0, 1):
+                cx, cy = (ix + dx) % period, (iy + dy) % period
+                corners.append(gx[cy, cx] * (fx - dx) + gy[cy, cx] * (fy - dy))
+        u, v = _fade(fx), _fade(fy)
+        top = corners[0] + u * (corners[1] - corners[0])
+        bottom = corners[2] + u * (corners[3] - corners[2])
+        total += (top + v * (bottom - top)) / (1 << octave)
+    table = _normalize(total)
+    table.flags.writeable = False
+    return table
+
+
+@lru_cache(maxsize=None)
+def palette(colors, n=256):
+    """[lookup table blending evenly spaced colors]
+
+    Arguments:
+        colors {[tuple]} -- [colors from RGB class]
+        n {[int]} -- [table entries]
+
+    Returns:
+        [array] -- [read only (n, 3) uint8 table]
+    """
+    stops = np.linspace(0, 1, len(colors))
+    at = np.linspace(0, 1, n)
+    channels = np.array(colors, dtype=np.float64)
+    table = np.stack([np.interp(at, stops, channels[:, c]) for c in range(3)],
+                     axis=1)
+    table = np.rint(table).astype(np.uint8)
+    table.flags.writeable = False
+    return table
+
+
+def lut_index(values, n=256):
+    """[maps 0-1 values to palette indexes]"""
+    return (values * (n - 1)).astype(np.intp)
@@ -0,0 +1,104 @@
+"""
+Vectorized 1D particle system rendering into BlinkyTape frames.
+
+Particles live in fixed size NumPy arrays (position, velocity, color,
+remaining and total lifetime), so spawning, integrating and splatting are
+array operations no matter how many particles are alive.
+"""
+import numpy as np
+
+
+class ParticleSystem(object):
+    def __init__(self, led_count, capacity=512, rng=None):
+        """[pool of particles on a strip of led_count LEDs]
+
+        Arguments:
+            led_count {[int]} -- [number of LEDs]
+            capacity {[int]} -- [maximum number of live particles]
+            rng {[RandomState]} -- [NumPy random source, for repeatable runs]
+        """
+        self.led_count = led_count
+        self.rng = rng if rng is not None else np.random.RandomState()
+        self.pos = np.zeros(capacity, dtype=np.float32)
+        self.vel = np.zeros(capacity, dtype=np.float32)
+        self.color = np.zeros((capacity, 3), dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float32)  # seconds left
+        self.lifetime = np.ones(capacity, dtype=np.float32)
+        self.canvas = np.zeros((led_count, 3), dtype=np.float32)
+        self.frame = np.zeros((led_count, 3), dtype=np.uint8)
+        self.channels = np.arange(3)
+
+    def alive(self):
+        """[returns the number of live particles]"""
+        return int(np.count_nonzero(self.life > 0))
+
+    def spawn(self, count, position, speed, col1, col2=None, life=1.0,
+              spread=0.0):
+        """[starts up to count particles in free slots]
+
+        Arguments:
+            count {[int]} -- [particles to start]
+            position {[float]} -- [starting LED position]
+            speed {[float]} -- [maximum speed in LEDs per second, random sign]
+            col1 {[RGB]} -- [color from RGB class]
+            col2 {[RGB]} -- [colors are mixed randomly between col1 and col2]
+            life {[float]} -- [maximum lifetime in seconds]
+            spread {[float]} -- [random offset around position in LEDs]
+        """
+        slots = np.flatnonzero(self.life <= 0)[:count]
+        n = len(slots)
+        if n == 0:
+            return 0
+        c1 = np.array(col1, dtype=np.float32)
+        c2 = np.array(col2 if col2 is not None else col1, dtype=np.float32)
+        mix = self.rng.random_sample((n, 1)).astype(np.float32)
+        self.pos[slots] = position + self.rng.uniform(-spread, spread, n)
+        self.vel[slots] = self.rng.uniform(-speed, speed, n)
+        self.color[slots] = c1 + mix * (c2 - c1)
+        self.lifetime[slots] = self.rng.uniform(0.5 * life, life, n)
+        self.life[slots] = self.lifetime[slots]
+        return n
+
+    def step(self, dt, drag=0.0, gravity=0.0):
+        """[integrates all particles by dt seconds]
+
+        Arguments:
+            dt {[float]} -- [time step in seconds]
+            drag {[float]} -- [fraction of velocity lost per second]
+            gravity {[float]} -- [acceleration in LEDs per second squared]
+        """
+        self.vel += gravity * dt
+        self.vel *= max(0.0, 1.0 - drag * dt)
+        self.pos += self.vel * dt
+        self.life -= dt
+        off_strip = (self.pos < -1) | (self.pos > self.led_count)
+        self.life[off_strip] = 0
+
+    def render(self, trail=0.0):
+        """[splats live particles into a frame with additive blending]
+
+        Each particle is split between its two nearest LEDs and fades out
+        over its lifetime.
+
+        Arguments:
+            trail {[float]} -- [fraction of the previous frame kept, 0-1]
+
+        Returns:
+            [array] -- [(led_count, 3) uint8 frame, reused between calls]
+        """
+        self.canvas *= trail
+        live = self.life > 0
+        pos = self.pos[live]
+        left = np.floor(pos)
+        frac = (pos - left)[:, None]
+        fade = (self.life[live] / self.lifetime[live])[:, None]
+        weight = self.color[live] * fade
+        index = np.concatenate([left, left + 1]).astype(np.intp)
+        weight = np.concatenate([weight * (1 - frac), weight * frac])
+        on_strip = (index >= 0) & (index < self.led_count)
+        flat = (index[on_strip, None] * 3 + self.channels).ravel()
+        self.canvas += np.bincount(
+            flat, weights=weight[on_strip].ravel(),
+            minlength=3 * self.led_count).reshape(self.led_count, 3)
+        np.clip(self.canvas, 0, 255, out=self.frame, casting='unsafe')
+        return self.frame
@@ -0,0 +1,85 @@
+"""
+Precomputed pixel mappings from a 2D canvas to strip order, so effects can
+draw in logical coordinates on panels, rings or arbitrary layouts.
+"""
+import numpy as np
+
+
+class PixelMap(object):
+    def __init__(self, index, shape):
+        """[mapping from canvas cells to LEDs]
+
+        Arguments:
+            index {[array]} -- [flat canvas index of each LED in strip order]
+            shape {[tuple]} -- [(height, width) of the canvas]
+        """
+        self.index = np.ascontiguousarray(index, dtype=np.intp)
+        self.shape = tuple(shape)
+        self.out = np.empty((len(self.index), 3), dtype=np.uint8)
+
+    @classmethod
+    def serpentine(cls, width, height, columns=False):
+        """[matrix wired in rows (or columns) that reverse every other line]
+
+        Arguments:
+            width {[int]} -- [LEDs per row]
+            height {[int]} -- [number of rows]
+            columns {[bool]} -- [strip runs up and down columns instead]
+        """
+        grid = np.arange(width * height).reshape(height, width)
+        if columns:
+            grid = grid.T.copy()
+        grid[1::2] = grid[1::2, ::-1]
+        return cls(grid.ravel(), (height, width))
+
+    @classmethod
+    def rings(cls, counts):
+        """[concentric rings, one canvas row per ring]
+
+        Every ring is spread over the full canvas width, so column x is the
+        same angle on each ring.
+
+        Arguments:
+            counts {[list]} -- [LEDs on each ring in strip order]
+        """
+        width = max(counts)
+        index = [r * width + np.arange(n) * width // n
+                 for r, n in enumerate(counts)]
+        return cls(np.concatenate(index), (len(counts), width))
+
+    @classmethod
+    def from_coordinates(cls, coords, width, height):
+        """[arbitrary layout, LED positions scaled onto the canvas]
+
+        Arguments:
+            coords {[array]} -- [(x, y) of each LED in strip order]
+            width {[int]} -- [canvas width]
+            height {[int]} -- [canvas height]
+        """
+        coords = np.asarray(coords, dtype=np.float64)
+        low = coords.min(axis=0)
+        span = np.maximum(coords.max(axis=0) - low, 1e-9)
+        cells = np.rint((coords - low) / span * [width - 1, height - 1])
+        cells = cells.astype(np.intp)
+        return cls(cells[:, 1] * width + cells[:, 0], (height, width))
+
+    def get_led_count(self):
+        return len(self.index)
+
+    def canvas(self, dtype=np.uint8):
+        """[returns a blank canvas to draw into]"""
+        return np.zeros(self.shape + (3,), dtype=dtype)
+
+    def apply(self, canvas):
+        """[reorders a canvas into strip order with one gather]
+
+        Arguments:
+            canvas {[array]} -- [(height, width, 3) pixel array]
+
+        Returns:
+            [array] -- [(led count, 3) frame, reused between calls for uint8]
+        """
+        flat = canvas.reshape(-1, 3)
+        if flat.dtype != self.out.dtype:
+            return flat.take(self.index, axis=0)
+        return flat.take(self.index, axis=0, out=self.out)
@@ -0,0 +1,60 @@
+"""
+Per-frame power limiting for BlinkyTape.
+
+Each frame's current draw is estimated from the sum of its channel values
+and frames over the budget are scaled down before they are sent.
+"""
+import numpy as np
+
+
+class PowerLimiter(object):
+    def __init__(self, budget_ma=500.0, ma_per_channel=20.0, idle_ma_per_led=1.0):
+        """[output stage keeping frames within a current budget]
+
+        Arguments:
+            budget_ma {[float]} -- [current available for the strip in mA,
+                                    None passes every frame through]
+            ma_per_channel {[float]} -- [draw of one channel at full brightness]
+            idle_ma_per_led {[float]} -- [draw of an LED that is off]
+        """
+        self.budget_ma = budget_ma
+        self.ma_per_channel = ma_per_channel
+        self.idle_ma_per_led = idle_ma_per_led
+        self.stats = {'frames': 0, 'limited': 0}
+        self.min_scale = 1.0
+
+    def estimate(self, pixels):
+        """[returns the estimated draw of a frame in mA]
+
+        Arguments:
+            pixels {[array]} -- [(n, 3) frame with values in 0-255]
+        """
+        return pixels.sum(dtype=np.float64) * self.ma_per_channel / 255 + \
+            self.idle_ma_per_led * len(pixels)
+
+    def __call__(self, frame):
+        """[scales a frame down if it exceeds the budget]
+
+        Usable as a BlinkyTape output stage, ahead of any dither stage.
+
+        Arguments:
+            frame {[array]} -- [frame array or RGB bytes]
+
+        Returns:
+            [array] -- [frame unchanged, or a float32 copy scaled to fit]
+        """
+        if isinstance(frame, (bytes, bytearray)):
+            pixels = np.frombuffer(frame, dtype=np.uint8).reshape(-1, 3)
+        else:
+            pixels = frame
+        self.stats['frames'] += 1
+        if self.budget_ma is None:
+            return frame
+        draw = self.estimate(pixels)
+        if draw <= self.budget_ma:
+            return frame
+        idle = self.idle_ma_per_led * len(pixels)
+        scale = max(self.budget_ma - idle, 0.0) / (draw - idle)
+        self.stats['limited'] += 1
+        self.min_scale = min(self.min_scale, scale)
+        return pixels * np.float32(scale)
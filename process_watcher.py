@@ -0,0 +1,145 @@
+"""
+Incremental process watcher used to detect running games without
+shelling out to tasklist/ps on every pass of the driver loop.
+"""
+import os
+import time
+import logging
+import threading
+
+
+class ProcessWatcher(object):
+    def __init__(self, games, proc_root='/proc', grace=10.0):
+        """[watches a /proc style directory for processes from a game list]
+
+        Names are read for PIDs that appeared since the previous scan, and
+        again for PIDs that did not match while they are younger than
+        grace, since exec or Wine/Proton can rewrite argv after start.
+        Everything else is answered from a pid -> match cache, which is
+        dropped for a PID whose start time changed because it was reused.
+
+        Arguments:
+            games {[list]} -- [process names to look for, substring matched]
+            proc_root {[string]} -- [directory laid out like /proc]
+            grace {[float]} -- [seconds a non-matching PID is re-read for]
+        """
+        self.proc_root = proc_root
+        self.games = list(games)
+        self.grace = grace
+        self.matches = {}  # pid -> matched game name or None
+        self.seen = {}  # pid -> (start time, time.time() first scanned)
+        self.running = False
+        self.subscribers = []
+        self.lock = threading.Lock()  # poll may run on a timer thread
+
+    def subscribe(self, callback):
+        """[registers a callback for running state changes]
+
+        Arguments:
+            callback {[function]} -- [called as callback(running, games)]
+        """
+        self.subscribers.append(callback)
+
+    def set_games(self, games):
+        """[replaces the game list and drops cached matches]
+
+        Arguments:
+            games {[list]} -- [process names to look for]
+        """
+        with self.lock:
+            self.games = list(games)
+            self.matches = {}
+            self.seen = {}
+
+    def process_name(self, pid):
+        """[reads the executable name of a pid, None if it went away]
+
+        Arguments:
+            pid {[string]} -- [pid directory name]
+
+        Returns:
+            [string] -- [basename of argv[0], falling back to comm]
+        """
+        base = os.path.join(self.proc_root, pid)
+        try:
+            with open(os.path.join(base, 'cmdline'), 'rb') as f:
+                argv0 = f.read().split(b'\0', 1)[0]
+            if argv0:
+                # Wine/Proton games show up with a Windows style path
+                name = argv0.decode('utf8', 'replace').replace('\\', '/')
+                return name.rsplit('/', 1)[-1]
+            with open(os.path.join(base, 'comm'), 'rb') as f:
+                return f.read().strip().decode('utf8', 'replace')
+        except (IOError, OSError):
+            return None
+
+    def start_time(self, pid):
+        """[reads when a pid started, in clock ticks since boot]
+
+        Arguments:
+            pid {[string]} -- [pid directory name]
+
+        Returns:
+            [string] -- [starttime field of stat, None if it went away]
+        """
+        try:
+            with open(os.path.join(self.proc_root, pid, 'stat'), 'rb') as f:
+                # the name in parentheses may hold spaces, skip past it
+                fields = f.read().rsplit(b')', 1)[-1].split()
+            return fields[19]
+        except (IOError, OSError, IndexError):
+            return None
+
+    def match(self, name):
+        """[returns the game a process name belongs to, if any]
+
+        Arguments:
+            name {[string]} -- [process name]
+        """
+        if name is None:
+            return None
+        for game in self.games:
+            if game in name:
+                return game
+        return None
+
+    def scan(self):
+        """[updates the pid cache with new and exited processes]
+
+        Returns:
+            [list] -- [games currently running]
+        """
+        try:
+            pids = set(p for p in os.listdir(self.proc_root) if p.isdigit())
+        except OSError:
+            logging.debug('Unable to list ' + self.proc_root)
+            return []
+        now = time.time()
+        for pid in set(self.matches) - pids:
+            del self.matches[pid]
+            del self.seen[pid]
+        for pid in pids:
+            start = self.start_time(pid)
+            seen = self.seen.get(pid)
+            if seen is None or seen[0] != start:
+                self.seen[pid] = (start, now)
+            elif self.matches[pid] or now - seen[1] > self.grace:
+                continue
+            self.matches[pid] = self.match(self.process_name(pid))
+        return sorted(set(g for g in self.matches.values() if g))
+
+    def poll(self):
+        """[scans and notifies subscribers when the running state flips]
+
+        Returns:
+            [bool] -- [True if any game is running]
+        """
+        with self.lock:
+            games = self.scan()
+        running = bool(games)
+        if running != self.running:
+            self.running = running
+            logging.info('Game state changed: ' + str(games))
+            for callback in self.subscribers:
+                callback(running, games)
+        return running
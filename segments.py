@@ -0,0 +1,84 @@
+"""
+Segment and sprite primitives writing NumPy slices into a frame buffer.
+
+Frames are (led count, 3) uint8 arrays that can be passed straight to
+BlinkyTape.send_frame.
+"""
+import numpy as np
+
+
+def new_frame(led_count):
+    """[returns an all-off frame]
+
+    Arguments:
+        led_count {[int]} -- [number of LEDs]
+    """
+    return np.zeros((led_count, 3), dtype=np.uint8)
+
+
+def rgb(col):
+    """[converts a color from the RGB class to a pixel array]
+
+    Arguments:
+        col {[RGB]} -- [color from RGB class]
+    """
+    return np.array([col.red, col.green, col.blue], dtype=np.uint8)
+
+
+def fill_range(frame, start, stop, col):
+    """[sets LEDs start..stop-1 to one color, clipped to the frame]
+
+    Arguments:
+        frame {[array]} -- [frame to draw into]
+        start {[int]} -- [first LED]
+        stop {[int]} -- [LED after the last one]
+        col {[RGB]} -- [color from RGB class]
+    """
+    frame[max(start, 0):max(stop, 0)] = (col.red, col.green, col.blue)
+    return frame
+
+
+def moving_block(frame, position, size, col, background=None):
+    """[draws a block of size LEDs starting at position]
+
+    Arguments:
+        frame {[array]} -- [frame to draw into]
+        position {[int]} -- [first LED of the block]
+        size {[int]} -- [number of LEDs in the block]
+        col {[RGB]} -- [color from RGB class]
+        background {[RGB]} -- [fills the rest of the frame when given]
+    """
+    if background is not None:
+        fill_range(frame, 0, len(frame), background)
+    return fill_range(frame, position, position + size, col)
+
+
+def repeat_pattern(frame, collist, offset=0):
+    """[tiles a list of colors along the frame]
+
+    Arguments:
+        frame {[array]} -- [frame to draw into]
+        collist {[RGB]} -- [color list from RGB class]
+        offset {[int]} -- [pattern shift in LEDs]
+    """
+    pattern = np.array([(c.red, c.green, c.blue) for c in collist],
+                       dtype=np.uint8)
+    positions = np.arange(offset, offset + len(frame))
+    return np.take(pattern, positions, axis=0, mode='wrap', out=frame)
+
+
+def hsv(hue, saturation=1.0, value=1.0):
+    """[converts hues to a float frame, like colorsys.hsv_to_rgb per LED]
+
+    Arguments:
+        hue {[array]} -- [hue of each LED in degrees]
+        saturation {[float]} -- [0-1]
+        value {[float]} -- [0-1]
+
+    Returns:
+        [array] -- [(len(hue), 3) float32 frame with values in 0-255]
+    """
+    k = (np.asarray(hue, dtype=np.float32)[:, None] / 60 +
+         np.array([5, 3, 1], dtype=np.float32)) % 6
+    k = np.clip(np.minimum(k, 4 - k), 0, 1)
+    return 255 * value * (1 - saturation * k)
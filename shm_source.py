@@ -0,0 +1,103 @@
+"""
+Shared-memory frame slot letting local processes drive BlinkyTape.
+
+The slot is a memory mapped file holding a sequence counter, the frame
+length and the pixel data. Writers make the counter odd while copying a
+frame and even once it is complete (a seqlock), so readers never block
+writers and simply retry a frame that was torn.
+"""
+import os
+import mmap
+import time
+import struct
+import tempfile
+
+HEADER = struct.Struct('<QI4x')  # sequence, frame length, padding
+
+
+def default_path():
+    """[returns the slot file path, in /dev/shm when available]"""
+    root = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(root, 'blinkytape')
+
+
+class FrameSlot(object):
+    def __init__(self, path=None, led_count=None):
+        """[maps a frame slot, creating it when led_count is given]
+
+        Arguments:
+            path {[string]} -- [slot file, defaults to default_path()]
+            led_count {[int]} -- [creates a slot for this many LEDs]
+        """
+        self.path = path or default_path()
+        if led_count is not None:
+            with open(self.path, 'wb') as f:
+                f.write(bytearray(HEADER.size + 3 * led_count))
+        with open(self.path, 'r+b') as f:
+            self.mm = mmap.mmap(f.fileno(), 0)
+        self.size = len(self.mm) - HEADER.size
+
+    def sequence(self):
+        """[returns the current sequence counter]"""
+        return HEADER.unpack_from(self.mm)[0]
+
+    def write(self, frame):
+        """[publishes a frame for readers]
+
+        Arguments:
+            frame {[bytes]} -- [RGB pixel data, or a NumPy uint8 array]
+        """
+        data = memoryview(frame).cast('B')
+        if len(data) > self.size:
+            raise RuntimeError("Frame does not fit in the slot!")
+        seq = self.sequence()
+        HEADER.pack_into(self.mm, 0, seq + 1, len(data))
+        self.mm[HEADER.size:HEADER.size + len(data)] = data
+        HEADER.pack_into(self.mm, 0, seq + 2, len(data))
+
+    def read_into(self, frame, last=0):
+        """[copies a new complete frame into frame]
+
+        A frame shorter than the destination leaves the rest zeroed, so
+        LEDs past its end are off.
+
+        Arguments:
+            frame {[bytearray]} -- [destination, sized for the slot]
+            last {[int]} -- [sequence of the last frame read]
+
+        Returns:
+            [int] -- [sequence of the frame read, 0 if there is no new
+                      frame or the writer was busy]
+        """
+        seq, length = HEADER.unpack_from(self.mm)
+        if seq & 1 or seq == last:
+            return 0
+        length = min(length, len(frame))
+        frame[:length] = self.mm[HEADER.size:HEADER.size + length]
+        frame[length:] = bytes(len(frame) - length)
+        if HEADER.unpack_from(self.mm)[0] != seq:
+            return 0
+        return seq
+
+    def close(self):
+        """[unmaps the slot]"""
+        self.mm.close()
+
+
+def pump(bt, slot, interval=0.0005):
+    """[shows frames from a slot whenever its sequence advances]
+
+    Arguments:
+        bt {[BlinkyTape]} -- [light controller object]
+        slot {[FrameSlot]} -- [slot written by external processes]
+        interval {[float]} -- [seconds to sleep when nothing changed]
+    """
+    frame = bytearray(min(slot.size, 3 * bt.get_led_count()))
+    last = 0
+    while True:
+        seq = slot.read_into(frame, last)
+        if seq:
+            last = seq
+            bt.send_frame(frame)
+        else:
+            time.sleep(interval)
@@ -0,0 +1,246 @@
+"""
+Compressed show files holding recorded frames.
+
+A show is split into blocks of block_frames frames. The first frame of a
+block is stored as is and every other frame as the XOR of it and the
+frame before, which leaves zeros wherever the strip did not change.
+Each block is compressed on its own with zlib or lzma and an index of
+block offsets at the end of the file lets a reader seek to any frame by
+decompressing a single block.
+
+Layout, little endian:
+
+    header  b'BTSHOW', version u8, codec u8, led count u32, fps f64,
+            block frames u32
+    blocks  compressed XOR delta frames
+    index   (offset u64, length u32) per block
+    footer  index offset u64, frame count u64, b'BTEND'
+"""
+import zlib
+import struct
+import numpy as np
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+MAGIC = b'BTSHOW'
+END = b'BTEND'
+VERSION = 1
+HEADER = struct.Struct('<6sBBIdI')
+ENTRY = struct.Struct('<QI')
+FOOTER = struct.Struct('<QQ5s')
+CODECS = {'zlib': 1, 'lzma': 2}
+
+
+def _compress(codec, data, level):
+    if codec == 'lzma':
+        return lzma.compress(data, preset=level)
+    return zlib.compress(data, level)
+
+
+def _decompress(codec, data):
+    if codec == 'lzma':
+        return lzma.decompress(data)
+    return zlib.decompress(data)
+
+
+class ShowWriter(object):
+    def __init__(self, path, led_count, fps, block_frames=120, codec='zlib',
+                 level=6):
+        """[writes frames to a show file, one block in memory at a time]
+
+        Arguments:
+            path {[string]} -- [show file]
+            led_count {[int]} -- [number of LEDs]
+            fps {[float]} -- [frames per second of playback]
+            block_frames {[int]} -- [frames per block, shorter blocks seek
+                                     faster, longer ones compress better]
+            codec {[string]} -- ['zlib' or 'lzma']
+            level {[int]} -- [compression level, 0-9]
+        """
+        if codec not in CODECS or codec == 'lzma' and lzma is None:
+            raise ValueError('Unsupported codec ' + str(codec))
+        self.led_count = led_count
+        self.block_frames = block_frames
+        self.codec = codec
+        self.level = level
+        self.frame_count = 0
+        self.index = []
+        self.block = np.zeros((block_frames, led_count * 3), dtype=np.uint8)
+        self.filled = 0
+        self.f = open(path, 'wb')
+        self.f.write(HEADER.pack(MAGIC, VERSION, CODECS[codec], led_count,
+                                 fps, block_frames))
+
+    def write(self, frame):
+        """[appends a frame]
+
+        Arguments:
+            frame {[array]} -- [up to led_count RGB triplets as uint8
+                                array or bytes, missing LEDs are off]
+        """
+        if isinstance(frame, (bytes, bytearray)):
+            frame = np.frombuffer(frame, dtype=np.uint8)
+        frame = np.asarray(frame, dtype=np.uint8).ravel()
+        row = self.block[self.filled]
+        row[:len(frame)] = frame
+        row[len(frame):] = 0
+        self.filled += 1
+        self.frame_count += 1
+        if self.filled == self.block_frames:
+            self._flush()
+
+    def _flush(self):
+        if not self.filled:
+            return
+        frames = self.block[:self.filled]
+        deltas = frames.copy()
+        np.bitwise_xor(frames[1:], frames[:-1], out=deltas[1:])
+        data = _compress(self.codec, deltas.tobytes(), self.level)
+        self.index.append((self.f.tell(), len(data)))
+        self.f.write(data)
+        self.filled = 0
+
+    def close(self):
+        """[writes the last block and the index]"""
+        self._flush()
+        index_offset = self.f.tell()
+        for entry in self.index:
+            self.f.write(ENTRY.pack(*entry))
+        self.f.write(FOOTER.pack(index_offset, self.frame_count, END))
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ShowReader(object):
+    def __init__(self, path):
+        """[random access to the frames of a show file]
+
+        Only the index and the most recently used block are kept in
+        memory, so reading frames in order decompresses every block once.
+
+        Arguments:
+            path {[string]} -- [show file]
+        """
+        self.f = open(path, 'rb')
+        magic, version, codec, self.led_count, self.fps, self.block_frames = \
+            HEADER.unpack(self.f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a version %d show file: %s'
+                             % (VERSION, path))
+        self.codec = dict((v, k) for k, v in CODECS.items())[codec]
+        self.f.seek(-FOOTER.size, 2)
+        index_offset, self.frame_count, end = \
+            FOOTER.unpack(self.f.read(FOOTER.size))
+        if end != END:
+            raise ValueError('Show file was not closed: ' + path)
+        self.f.seek(index_offset)
+        blocks = (self.frame_count + self.block_frames - 1) // self.block_frames
+        self.index = np.frombuffer(self.f.read(blocks * ENTRY.size),
+                                   dtype=[('offset', '<u8'), ('length', '<u4')])
+        self.cached = None  # number of the block held in self.frames
+        self.frames = None
+
+    def __len__(self):
+        return self.frame_count
+
+    @property
+    def duration(self):
+        """[seconds of playback]"""
+        return self.frame_count / self.fps
+
+    def block(self, number):
+        """[decodes one block]
+
+        Returns:
+            [array] -- [(frames, led_count, 3) uint8 frames, read only]
+        """
+        if number != self.cached:
+            offset, length = self.index[number]
+            self.f.seek(int(offset))
+            data = _decompress(self.codec, self.f.read(int(length)))
+            deltas = np.frombuffer(data, dtype=np.uint8)
+            frames = np.bitwise_xor.accumulate(
+                deltas.reshape(-1, self.led_count * 3), axis=0)
+            frames.flags.writeable = False
+            self.frames = frames.reshape(len(frames), self.led_count, 3)
+            self.cached = number
+        return self.frames
+
+    def frame(self, i):
+        """[returns frame i as a read only (led_count, 3) uint8 array]"""
+        if not 0 <= i < self.frame_count:
+            raise IndexError('Frame %d outside the show' % i)
+        return self.block(i // self.block_frames)[i % self.block_frames]
+
+    def at(self, seconds):
+        """[returns the frame shown seconds into the show]"""
+        return self.frame(min(int(seconds * self.fps), self.frame_count - 1))
+
+    def __iter__(self):
+        for number in range(len(self.index)):
+            for frame in self.block(number):
+                yield frame
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def save(path, frames, fps, **kwargs):
+    """[writes frames, ex: HeadlessTape.frames, to a show file]
+
+    Arguments:
+        path {[string]} -- [show file]
+        frames {[list]} -- [(led_count, 3) uint8 frames]
+        fps {[float]} -- [frames per second of playback]
+        kwargs -- [block_frames, codec and level, see ShowWriter]
+
+    Returns:
+        [int] -- [frames written]
+    """
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        raise ValueError('No frames to save')
+    first = np.asarray(first)
+    with ShowWriter(path, len(first), fps, **kwargs) as writer:
+        writer.write(first)
+        for frame in frames:
+            writer.write(frame)
+    return writer.frame_count
+
+
+def record(path, tape, fps=60, **kwargs):
+    """[saves what a HeadlessTape showed, resampled to a steady rate]
+
+    Arguments:
+        path {[string]} -- [show file]
+        tape {[HeadlessTape]} -- [tape run with record=True]
+        fps {[float]} -- [frames per second of the show file]
+        kwargs -- [block_frames, codec and level, see ShowWriter]
+
+    Returns:
+        [int] -- [frames written]
+    """
+    if not tape.times:
+        raise ValueError('Tape has no recorded frames, run it with '
+                         'record=True and show at least one frame')
+    times = np.array(tape.times)
+    end = tape.clock.time()
+    with ShowWriter(path, tape.get_led_count(), fps, **kwargs) as writer:
+        for t in np.arange(times[0], end, 1.0 / fps):
+            writer.write(tape.frames[np.searchsorted(times, t, 'right') - 1])
+    return writer.frame_count
@@ -0,0 +1,141 @@
+"""
+Keyframe timelines describing a show in a few lines of JSON.
+
+    {
+        "loop": true,
+        "keyframes": [
+            {"t": 0, "colors": ["navy", "purple"], "easing": "ease_in_out"},
+            {"t": 4, "colors": ["deeppink1", "gold1"], "offset": 30},
+            {"t": 6, "colors": ["deeppink1", "gold1"], "offset": 30,
+             "brightness": 0.2, "easing": "step"},
+            {"t": 10, "colors": ["navy"]}
+        ]
+    }
+
+Each keyframe sets the state of the strip at time t in seconds:
+
+    colors      evenly spaced gradient stops along the strip, as names
+                from the RGB class or [r, g, b] lists, blended in OKLab
+    offset      LEDs the gradient is rotated by, default 0
+    brightness  0-1, default 1
+
+Between two keyframes every parameter moves from the first keyframe's
+value to the second's along the first keyframe's easing curve. The
+blend of each segment is precomputed when the timeline is built, so a
+frame costs one multiply-add and one gather over the strip.
+"""
+import json
+import bisect
+import numpy as np
+import gradients
+from config import named_color
+
+
+def _smoothstep(u):
+    return u * u * (3 - 2 * u)
+
+
+EASINGS = {
+    'linear': lambda u: u,
+    'step': lambda u: 0.0 if u < 1 else 1.0,
+    'ease_in': lambda u: u * u,
+    'ease_out': lambda u: u * (2 - u),
+    'ease_in_out': _smoothstep,
+}
+
+
+def _color(value):
+    if isinstance(value, str):
+        return named_color(value)
+    red, green, blue = [max(0, min(int(v), 255)) for v in value]
+    return (red, green, blue)
+
+
+class Timeline(object):
+    def __init__(self, keyframes, led_count, loop=False):
+        """[precomputes the segments between keyframes]
+
+        Arguments:
+            keyframes {[list]} -- [dicts as described in the module
+                                   docstring, at least two]
+            led_count {[int]} -- [number of LEDs]
+            loop {[bool]} -- [starts over after the last keyframe]
+        """
+        if len(keyframes) < 2:
+            raise ValueError('A timeline needs at least 2 keyframes')
+        keyframes = sorted(keyframes, key=lambda k: float(k['t']))
+        self.led_count = led_count
+        self.loop = loop
+        self.start = float(keyframes[0]['t'])
+        self.duration = float(keyframes[-1]['t']) - self.start
+        self.index = np.arange(led_count)
+        self.out = np.zeros((led_count, 3), dtype=np.float32)
+        self.times = []  # start time of each segment
+        # (start, 1 / length, base, delta, offset, shift, easing)
+        self.segments = []
+        states = [self._state(k) for k in keyframes]
+        for k, a, b in zip(keyframes, states, states[1:]):
+            t0, t1 = a[0], b[0]
+            if t1 <= t0:
+                continue  # keyframes at the same time make a hard cut
+            easing = EASINGS[k.get('easing', 'linear')]
+            self.times.append(t0)
+            self.segments.append((t0, 1.0 / (t1 - t0), a[1], b[1] - a[1],
+                                  a[2], b[2] - a[2], easing))
+        if not self.segments:
+            raise ValueError('A timeline needs keyframes at different times')
+        self.current = 0
+
+    def _state(self, keyframe):
+        """[returns (t, frame scaled by brightness, offset) of a keyframe]"""
+        colors = tuple(_color(c) for c in keyframe['colors'])
+        if len(colors) == 1:
+            colors = colors * 2
+        frame = gradients.gradient(colors, self.led_count, 'oklab', 'float32')
+        frame = frame * np.float32(keyframe.get('brightness', 1))
+        return (float(keyframe['t']), frame, float(keyframe.get('offset', 0)))
+
+    def frame(self, t):
+        """[evaluates the timeline, fastest when t only moves forward]
+
+        Arguments:
+            t {[float]} -- [seconds from the start of the timeline]
+
+        Returns:
+            [array] -- [(led_count, 3) float32 frame, reused between calls]
+        """
+        t += self.start
+        if self.loop and self.duration > 0:
+            t = self.start + (t - self.start) % self.duration
+        segment = self.segments[self.current]
+        if t < segment[0]:
+            self.current = max(bisect.bisect_right(self.times, t) - 1, 0)
+        while self.current + 1 < len(self.segments) and \
+                t >= self.times[self.current + 1]:
+            self.current += 1
+        t0, rate, base, delta, offset, shift, easing = \
+            self.segments[self.current]
+        u = min(max((t - t0) * rate, 0.0), 1.0)
+        e = easing(u)
+        np.multiply(delta, np.float32(e), out=self.out)
+        self.out += base
+        offset = int(round(offset + shift * e))
+        if offset:
+            self.out[:] = np.take(self.out, self.index - offset, axis=0,
+                                  mode='wrap')
+        return self.out
+
+
+def load(path, led_count):
+    """[reads a timeline from a JSON file]
+
+    Arguments:
+        path {[string]} -- [JSON file, see the module docstring]
+        led_count {[int]} -- [number of LEDs]
+
+    Returns:
+        [Timeline] -- [ready to evaluate]
+    """
+    with open(path) as f:
+        data = json.load(f)
+    return Timeline(data['keyframes'], led_count, data.get('loop', False))